@@ -2,17 +2,31 @@
 # import sys
 # from copy import deepcopy
 from math import ceil
+import time
 from random import shuffle
 
-from lib.dijkstra import dijkstras_path
+from lib.action_queues import ActionQueueStore
+from lib.astar import astar_path
+from lib.dibs import DibsLedger
+from lib.distance_fields import HomeFields
 from lib.evasion import evasion_check
+from lib.grid import manhattan_field
+from lib.lichen import LichenFrontier
+from lib.morphology import dilate, positions_mask
+from lib.occupancy import OccupancyGrid
+from lib.path_cache import PathCache
+from lib.static_index import get_static_index
+from lib.unit_table import UnitTable
+from lib.voronoi import get_factory_voronoi
+from lib.warmup import WarmPaths, warm_up_budget
 from lib.excavation_utils import *
 from lib.factory_utils import *
 from lib.utils import *
 from lib.queue_builder import QueueBuilder
 from lib.setup_factories import setup
+from lib.setup_utils import PlacementScores
 
-from lux.kit import obs_to_game_state
+from lux.kit import GameStateStore
 from lux.config import EnvConfig
 
 
@@ -28,32 +42,45 @@ class Agent():
         self.env_cfg: EnvConfig = env_cfg
         self.step = 0
         self.board = None
+        self.game_state_store = GameStateStore(env_cfg)  # units and factories kept between steps
         self.opp_strains = []  # list of strains
         self.my_strains = []
 
         # queues
-        self.action_queue = dict()
-        self.new_queue = dict()
+        self.action_queue = ActionQueueStore()  # uid: queue, and the queues to submit this step
 
-        # occupied
-        self.occupied_next = set()
+        # occupied, OccupancyGrids rebuilt every step in update_occupied_next
+        self.occupied_next = OccupancyGrid()
+        self.threat_tiles = OccupancyGrid()  # opp heavies and the tiles they can step onto
 
         # units
         self.my_units = dict()
         self.my_heavy_units = dict()
         self.my_light_units = dict()
+        self.my_light_positions = dict()  # uid: pos of my_light_units when they were split, see update_and_assign_helpers
         self.opp_units = dict()
+        self.my_unit_table = None  # the same units as arrays, see lib/unit_table.py, rebuilt every step
+        self.opp_unit_table = None
+        self.my_heavy_table = None  # my_heavy_units as a UnitTable
+        self.my_heavy_tiles = OccupancyGrid()  # where my_heavy_units stand
 
         # factories
         self.my_factories = dict()
         self.opp_factories = dict()
-        self.my_factory_tiles = set()
-        self.opp_factory_tiles = set()
+        self.my_factory_tiles = OccupancyGrid()
+        self.opp_factory_tiles = OccupancyGrid()
+        self.my_factory_index = None  # closest factory to every tile, rebuilt when a factory is destroyed
+        self.opp_factory_index = None
+        self.lichen_frontier = None  # where each strain's lichen can spread, rebuilt every step
 
         # factory resources
         self.number_of_factories = 0
         self.my_factory_centers = set()
         self.factory_resources = dict()  # fid: [ice, ore]
+        self.placement_scores = PlacementScores()  # score layers kept between placement turns
+
+        # ice and ore, set from the first observation
+        self.static_index = None
 
         # paths
         self.low_rubble_scores = np.ndarray([])
@@ -64,6 +91,9 @@ class Agent():
         self.clearing_path_costs = dict()  # fid: [cost]
         self.path_home = dict()  # uid: [path]
         self.cost_home = dict()  # uid: [cost]
+        self.home_fields = None  # cost/path home from every tile, rebuilt each step
+        self.path_cache = PathCache()  # paths found by QueueBuilder, dropped when rubble on them changes
+        self.warm_paths = WarmPaths()  # ore and clearing paths worked out during bidding and placement
 
         # States
         self.unit_states = dict()  # uid: "state"
@@ -82,8 +112,8 @@ class Agent():
         self.factory_helpers = dict()  # {fid: [unit_id, unit_id, etc]}
 
         # dibs
-        self.light_mining_dibs = dict()  # {unit_id: pos}
-        self.heavy_mining_dibs = dict()
+        self.light_mining_dibs = DibsLedger()  # {unit_id: pos}
+        self.heavy_mining_dibs = DibsLedger()
         self.lichen_dibs = dict()  # {unit_id: [pos, pos, etc]}
         self.aggro_dibs = dict()  # {unit_id: fid}
 
@@ -101,6 +131,9 @@ class Agent():
         self.adjacency_scores = []
 
     def early_setup(self, step: int, obs, remainingOverageTime: int = 60):
+        if step == 0:
+            self.static_index = get_static_index(obs["board"])
+        self.path_cache.invalidate_tiles(obs["board_changes"]["rubble"])
         queue, factories_to_place, factory_position, low_rubble_scores, adjacency_score = setup(self, step, obs, remainingOverageTime)
         if factories_to_place > self.number_of_factories:
             self.number_of_factories = factories_to_place
@@ -115,8 +148,36 @@ class Agent():
         if adjacency_score is not None:
             self.adjacency_scores.append(adjacency_score)
 
+        self.warm_up(step, obs, remainingOverageTime)
         return queue
 
+    def warm_up(self, step: int, obs, remainingOverageTime: int = 60):
+        # spend the idle part of bidding and placement steps on what the first real steps would otherwise search for
+        deadline = time.time() + warm_up_budget(remainingOverageTime)
+        board = obs["board"]
+        if step == 0:
+            self.placement_scores.prime(board)
+            return
+
+        factory_positions = {fid: np.array(f["pos"]) for fid, f in obs["factories"][self.player].items()}
+        opp_factory_tiles = []
+        for f in obs["factories"][self.opp_player].values():
+            opp_factory_tiles.extend(get_factory_tiles(np.array(f["pos"])))
+
+        # my factories first, then the spots I'd most likely place the next one
+        for factory_pos in list(factory_positions.values()) + self.placement_scores.candidates:
+            if time.time() > deadline:
+                return
+            self.find_ore_path(factory_pos, opp_factory_tiles, board)
+
+        if len(factory_positions) == 0 or time.time() > deadline:
+            return
+        # clearing tiles get picked one factory after the other, same as on step 1
+        clearing_positions = self.find_clearing_positions(list(factory_positions.values()), 4, 12,
+                                                          self.low_rubble_scores.copy())
+        clearing_tiles = dict(zip(factory_positions.keys(), clearing_positions))
+        self.find_clearing_paths(factory_positions, clearing_tiles, opp_factory_tiles, board)
+
     def set_factory_helper_amounts(self):
         for fid, factory in self.my_factories.items():
             if self.factory_adjacency_scores[fid] == 45:
@@ -150,7 +211,7 @@ class Agent():
             if fid not in self.factory_helpers.keys():
                 self.factory_helpers[fid] = []
 
-            sorted_units = sorted(units, key=lambda x: distance_to(x.pos, factory.pos))
+            sorted_units = sorted(units, key=lambda x: distance_to(self.my_light_positions[x.unit_id], factory.pos))
             helpers_wanted = self.factory_helper_amounts[fid]
             helpers_wanted = 2
             helpers_wanted -= len(self.factory_helpers[fid])
@@ -182,62 +243,87 @@ class Agent():
                 self.factory_low_charge_heavy[fid] = False
 
     def set_ore_paths(self):
-        rubble_map = np.copy(self.board['rubble'])
         for fid, factory in self.my_factories.items():
-            self.ore_paths[fid] = []
             # print(f"finding ore path for factory {fid}", file=sys.stderr)
-            closest_ore = closest_resource_tile("ore", factory.pos, list(self.opp_factory_tiles), self.board)
-            if closest_ore is not None:
-                ore_distance = distance_to(closest_ore, factory.pos)
-                if ore_distance < 20:
-                    ore_path = dijkstras_path(rubble_map, factory.pos, closest_ore, [], list(self.opp_factory_tiles),
-                                              rubble_threshold=60)
-                    if len(ore_path) > ore_distance * 2:
-                        ore_path = dijkstras_path(rubble_map, factory.pos, closest_ore, [],
-                                                  list(self.opp_factory_tiles),
-                                                  rubble_threshold=90)
-                    self.ore_paths[fid] = ore_path
-
-    def find_clearing_position(self, target_position, min_distance, max_distance):
-        best_coord = None
-        max_score = float('-inf')
-        for i in range(self.low_rubble_scores.shape[0]):
-            for j in range(self.low_rubble_scores.shape[1]):
-                current_coord = np.array([i, j])
-                distance = distance_to(target_position, current_coord)
-                if min_distance <= distance <= max_distance and self.low_rubble_scores[i, j] > max_score:
-                    max_score = self.low_rubble_scores[i, j]
-                    best_coord = current_coord
-        n = 5
-        x, y = best_coord
-        for i in range(-n, n + 1):
-            for j in range(-n, n + 1):
-                if abs(i) + abs(j) <= n and 0 <= x + i < self.low_rubble_scores.shape[0] and 0 <= y + j < \
-                        self.low_rubble_scores.shape[1]:
-                    self.low_rubble_scores[x + i, y + j] = 0
-        return best_coord
+            self.ore_paths[fid] = self.find_ore_path(factory.pos, self.opp_factory_tiles, self.board)
+
+    def find_ore_path(self, factory_pos, opp_factory_tiles, board) -> list:
+        rubble_map = board['rubble']
+        closest_ore = closest_resource_tile("ore", factory_pos, list(opp_factory_tiles), board)
+        if closest_ore is not None:
+            ore_distance = distance_to(closest_ore, factory_pos)
+            if ore_distance < 20:
+                ore_path = self.warm_paths.search(rubble_map, factory_pos, closest_ore, list(opp_factory_tiles),
+                                                  rubble_threshold=60)
+                if len(ore_path) > ore_distance * 2:
+                    ore_path = self.warm_paths.search(rubble_map, factory_pos, closest_ore, list(opp_factory_tiles),
+                                                      rubble_threshold=90)
+                return ore_path
+        return []
+
+    def find_clearing_positions(self, target_positions, min_distance, max_distance, scores=None) -> list:
+        # the best scoring tile min_distance to max_distance away from each target, None if there are no such tiles
+        # targets are done in order, each pick zeroes the scores within 5 of it for the ones after
+        if scores is None:
+            scores = self.low_rubble_scores
+        distances = np.array([manhattan_field(pos) for pos in target_positions]).reshape((-1,) + scores.shape)
+        in_range = (min_distance <= distances) & (distances <= max_distance)
+        best_coords = []
+        for target_in_range in in_range:
+            if not target_in_range.any():
+                best_coords.append(None)
+                continue
+            # argmax goes with the first tile in row major order on ties, like the old scan did
+            best_coord = np.array(np.unravel_index(np.argmax(np.where(target_in_range, scores, -np.inf)), scores.shape))
+            # don't pick anything within 5 of this one for the next factory
+            scores[dilate(positions_mask([best_coord], scores.shape), 5)] = 0
+            best_coords.append(best_coord)
+        return best_coords
 
     def set_clearing_paths(self):
-        rubble_map = np.copy(self.board['rubble'])
-        ice_map = np.copy(self.board['ice'])
-        ore_map = np.copy(self.board['ore'])
-        resource_positions = np.column_stack(np.where((ice_map == 1) | (ore_map == 1)))
-        off_limits = [pos for pos in resource_positions]
-        off_limits.extend(list(self.opp_factory_tiles))
-        for fid, factory in self.my_factories.items():
-            clearing_tile = self.factory_clearing_tiles[fid]
+        factory_positions = {fid: factory.pos for fid, factory in self.my_factories.items()}
+        clearing_paths = self.find_clearing_paths(factory_positions, self.factory_clearing_tiles,
+                                                  self.opp_factory_tiles, self.board)
+        self.clearing_paths.update(clearing_paths)
+        for fid in self.my_factories.keys():
+            if fid not in self.ore_paths.keys():
+                self.ore_paths[fid] = []
+
+    def find_clearing_paths(self, factory_positions, clearing_tiles, opp_factory_tiles, board) -> dict:
+        rubble_map = board['rubble']
+        off_limits = [pos for pos in self.static_index.resource_coords]
+        off_limits.extend(list(opp_factory_tiles))
+        clearing_paths = dict()
+        for fid, factory_pos in factory_positions.items():
+            clearing_tile = clearing_tiles[fid]
             if clearing_tile is not None:
                 # add all factory tiles to off limits *except* for the home factory
-                my_factory_tiles = [get_factory_tiles(f.pos) for i, f in self.my_factories.items() if i != fid]
+                my_factory_tiles = [get_factory_tiles(pos) for i, pos in factory_positions.items() if i != fid]
                 for tiles in my_factory_tiles:
                     for tile in tiles:
                         off_limits.append(tile)
 
-                clearing_path = dijkstras_path(rubble_map, factory.pos, clearing_tile, [], off_limits,
-                                               rubble_threshold=100)
-                self.clearing_paths[fid] = clearing_path
-            if fid not in self.ore_paths.keys():
-                self.ore_paths[fid] = []
+                clearing_paths[fid] = self.warm_paths.search(rubble_map, factory_pos, clearing_tile, off_limits,
+                                                             rubble_threshold=100)
+        return clearing_paths
+
+    def update_path_cache(self, obs, last_opp_factory_tiles):
+        self.path_cache.reset_counters()
+        if self.opp_factory_tiles != last_opp_factory_tiles:
+            # a factory died and opened up its tiles, any cached path might have a shortcut now
+            self.path_cache.clear()
+        else:
+            self.path_cache.invalidate_tiles(obs["board_changes"]["rubble"])
+
+    def set_home_fields(self):
+        self.home_fields = HomeFields(self.board['rubble'], self.my_factories, self.opp_factory_tiles, self.env_cfg)
+
+    def closest_my_factory(self, position):
+        # the factory get_closest_factory(self.my_factories, position) would pick, read off the index
+        return self.my_factories[self.my_factory_index.closest(position)]
+
+    def closest_opp_factory(self, position):
+        return self.opp_factories[self.opp_factory_index.closest(position)]
 
     def set_ore_path_costs(self):
         for fid, path in self.ore_paths.items():
@@ -267,57 +353,27 @@ class Agent():
                 self.action_queue[unit.unit_id] = []
 
     def pop_action_queue(self):
-        new_actions = dict()
-        for unit_id, queue in self.action_queue.items():
-
-            if isinstance(queue, list):
-                if len(queue) > 1:
-                    # if there are more repetitions, decrement the repetitions and keep the queue
-                    nq = queue[0]
-                    nq[5] -= 1
-                    if nq[5] == 0:
-                        # if there are no more repetitions, pop the queue
-                        new_actions[unit_id] = queue[1:]
-                    else:
-                        new_actions[unit_id] = [nq] + queue[1:]
-
-                elif len(queue) == 1:
-                    nq = queue[0]
-                    nq[5] -= 1
-                    if nq[5] == 0:
-                        # reset action queue
-                        new_actions[unit_id] = []
-
-                        # remove from tasks
-                        for fid, units in self.factory_tasks_light.items():
-                            if unit_id in units.keys():
-                                del self.factory_tasks_light[fid][unit_id]
-                        for fid, units in self.factory_tasks_heavy.items():
-                            if unit_id in units.keys():
-                                del self.factory_tasks_heavy[fid][unit_id]
-                    else:
-                        new_actions[unit_id] = [nq]
-            else:
-                # it's a factory action, delete it
-                continue
-
-        self.action_queue = new_actions
+        for unit_id in self.action_queue.pop():
+            # the queue ran out, remove from tasks
+            for fid, units in self.factory_tasks_light.items():
+                if unit_id in units.keys():
+                    del self.factory_tasks_light[fid][unit_id]
+            for fid, units in self.factory_tasks_heavy.items():
+                if unit_id in units.keys():
+                    del self.factory_tasks_heavy[fid][unit_id]
 
     def update_occupied_next(self):
         # self.occupied_next = [f.pos for i, f in factories.items()]
-        self.occupied_next = set()
-        self.opp_factory_tiles = set()
-        self.my_factory_tiles = set()
-        opp_factory_tiles = [get_factory_tiles(f.pos) for i, f in self.opp_factories.items()]
-        for tiles in opp_factory_tiles:
-            for tile in tiles:
-                self.occupied_next.add((tile[0], tile[1]))
-                self.opp_factory_tiles.add((tile[0], tile[1]))
-
-        my_factory_tiles = [get_factory_tiles(f.pos) for i, f in self.my_factories.items()]
-        for tiles in my_factory_tiles:
-            for tile in tiles:
-                self.my_factory_tiles.add((tile[0], tile[1]))
+        self.opp_factory_tiles = OccupancyGrid()
+        self.my_factory_tiles = OccupancyGrid()
+        for i, f in self.opp_factories.items():
+            self.opp_factory_tiles.update(get_factory_tiles(f.pos))
+        for i, f in self.my_factories.items():
+            self.my_factory_tiles.update(get_factory_tiles(f.pos))
+        self.occupied_next = self.opp_factory_tiles.copy()
+
+        self.threat_tiles = OccupancyGrid()
+        self.threat_tiles.merge_mask(self.opp_unit_table.reach(self.opp_unit_table.is_heavy))
 
         for uid, state in self.unit_states.items():
             if state == "low battery":
@@ -327,54 +383,25 @@ class Agent():
                     self.occupied_next.add(pos)
 
     def clear_dead_units_from_memory(self):
-        new_light_dibs = dict()
-        for uid in self.light_mining_dibs.keys():
-            if uid in self.my_units.keys():
-                new_light_dibs[uid] = self.light_mining_dibs[uid]
-        self.light_mining_dibs = new_light_dibs
-
-        new_heavy_dibs = dict()
-        for uid in self.heavy_mining_dibs.keys():
-            if uid in self.my_units.keys():
-                new_heavy_dibs[uid] = self.heavy_mining_dibs[uid]
-        self.heavy_mining_dibs = new_heavy_dibs
-
-        new_unit_states = dict()
-        for uid in self.unit_states.keys():
-            if uid in self.my_units.keys():
-                new_unit_states[uid] = self.unit_states[uid]
-        self.unit_states = new_unit_states
-
-        new_factory_homers = dict()
-        # print(f"BEFORE factory homers: {self.factory_homers}", file=sys.stderr)
-        for fid, uid in self.factory_homers.items():
-            if uid in self.my_units.keys() and fid in self.my_factories.keys():
-                new_factory_homers[fid] = uid
-        self.factory_homers = new_factory_homers
-        # print(f"AFTER factory homers: {self.factory_homers}", file=sys.stderr)
-
-        new_factory_icers = dict()
-        # print(f"BEFORE factory icers: {self.factory_icers}", file=sys.stderr)
-        for fid, uid in self.factory_icers.items():
-            if uid in self.my_units.keys() and fid in self.my_factories.keys():
-                new_factory_icers[fid] = uid
-        self.factory_icers = new_factory_icers
-        # print(f"AFTER factory icers: {self.factory_icers}", file=sys.stderr)
+        dead_units = self.game_state_store.died["units"].get(self.player, set())
+        dead_factories = self.game_state_store.died["factories"].get(self.player, set())
+        if dead_units:
+            self.light_mining_dibs.keep_only(self.my_units.keys())
+            self.heavy_mining_dibs.keep_only(self.my_units.keys())
+            for uid in dead_units:
+                self.unit_states.pop(uid, None)
+
+        # '' marks a factory without a homer or icer, those get dropped too and set again in define_factory_needs
+        for assignments in [self.factory_homers, self.factory_icers]:
+            for fid in [fid for fid, uid in assignments.items()
+                        if uid == '' or uid in dead_units or fid in dead_factories]:
+                del assignments[fid]
 
     def avoid_collisions(self, unit, state):
-        if unit.unit_id in self.action_queue.keys() and state != "low battery":
-            queue = self.action_queue[unit.unit_id]
-
+        if state != "low battery":
             # if you have an action queue, check the next position
-            if isinstance(queue, list) and len(queue) > 0:
-
-                # if you're moving, next_pos is the next position
-                if queue[0][0] == 0:
-                    next_pos = next_position(unit.pos, queue[0][1])
-                    new_pos = (next_pos[0], next_pos[1])
-                # otherwise, next_pos is the current position
-                else:
-                    new_pos = (unit.pos[0], unit.pos[1])
+            if self.action_queue.has_actions(unit.unit_id):
+                new_pos = self.action_queue.next_position(unit)
 
                 # if the next position is already occupied, clear the action queue
                 if new_pos in self.occupied_next:
@@ -392,44 +419,16 @@ class Agent():
                     self.action_queue[unit.unit_id] = []
 
     def add_nextpos_to_occnext(self, unit):
-        if unit.unit_id in self.action_queue.keys():
-            queue = self.action_queue[unit.unit_id]
-            # if you have an action queue, check the next position
-            if isinstance(queue, list) and len(queue) > 0:
-
-                # if you're moving, next_pos is the next position
-                if queue[0][0] == 0:
-                    next_pos = next_position(unit.pos, queue[0][1])
-                    new_pos = (next_pos[0], next_pos[1])
-                # otherwise, next_pos is the current position
-                else:
-                    new_pos = (unit.pos[0], unit.pos[1])
-
-                # add new_pos to occupied_next
-                self.occupied_next.add(new_pos)
-
-            # if you don't have an action queue, add the current position to occupied_next
-            else:
-                pos = (unit.pos[0], unit.pos[1])
-                self.occupied_next.add(pos)
+        if unit.unit_id in self.action_queue:
+            # the next position if you have an action queue, the current position if you don't
+            self.occupied_next.add(self.action_queue.next_position(unit))
 
     def remove_old_next_pos_from_occ_next(self, unit):
-        if unit.unit_id in self.action_queue.keys():
-            queue = self.action_queue[unit.unit_id]
-            # if you have an action queue, check the next position
-            if isinstance(queue, list) and len(queue) > 0:
-
-                # if you're moving, next_pos is the next position
-                if queue[0][0] == 0:
-                    next_pos = next_position(unit.pos, queue[0][1])
-                    old_pos = (next_pos[0], next_pos[1])
-                # otherwise, next_pos is the current position
-                else:
-                    old_pos = (unit.pos[0], unit.pos[1])
-
-                # remove old_pos from occupied_next
-                if old_pos in self.occupied_next:
-                    self.occupied_next.remove(old_pos)
+        # if you have an action queue, remove your next position from occupied_next
+        if self.action_queue.has_actions(unit.unit_id):
+            old_pos = self.action_queue.next_position(unit)
+            if old_pos in self.occupied_next:
+                self.occupied_next.remove(old_pos)
 
     def remove_task_from_factory(self, unit):
         unit_id = unit.unit_id
@@ -477,25 +476,18 @@ class Agent():
         # first remove the old next position from occupied_next if it exists
         self.remove_old_next_pos_from_occ_next(unit)
 
-        if isinstance(queue, list) and queue:
-            if queue[0][0] == 0:
-                new_pos = next_position(unit.pos, queue[0][1])
-                new_pos = (new_pos[0], new_pos[1])
-                self.occupied_next.add(new_pos)
-            else:
-                new_pos = (unit.pos[0], unit.pos[1])
-                self.occupied_next.add(new_pos)
-        elif not queue:
-            new_pos = (unit.pos[0], unit.pos[1])
-            self.occupied_next.add(new_pos)
         self.action_queue[unit.unit_id] = queue
+        if not isinstance(queue, int) or queue == 0:
+            # the next position of a unit with a queue, the current one of a unit without or a factory building a light
+            self.occupied_next.add(self.action_queue.next_position(unit))
         if new_queue:
-            self.new_queue[unit.unit_id] = queue
+            # what the store made of it, so an empty builder queue goes out as [] and gets dropped
+            self.action_queue.submit(unit.unit_id, self.action_queue[unit.unit_id])
 
     def finalize_new_queue(self):
         actions_to_submit = dict()
-        for unit_id, queue in self.new_queue.items():
-            if isinstance(queue, list) and queue and queue != [[]]:
+        for unit_id, queue in self.action_queue.dirty.items():
+            if isinstance(queue, list) and queue:
                 actions_to_submit[unit_id] = queue
             elif isinstance(queue, int):
                 actions_to_submit[unit_id] = queue
@@ -550,7 +542,13 @@ class Agent():
                 continue
 
         self.my_heavy_units = heavies
+        self.my_heavy_table = UnitTable(heavies)
+        self.my_heavy_tiles = OccupancyGrid()
+        self.my_heavy_tiles.merge_mask(self.my_heavy_table.occupancy())
         self.my_light_units = lights
+        # unit objects outlive the step and get their new pos from the next observation, the positions are kept
+        # separately so helpers are still picked by where the lights were when this list was made
+        self.my_light_positions = {u.unit_id: (int(u.pos[0]), int(u.pos[1])) for u in lights}
         return heavies, lights, helpers, adjacents, homers, icers, heavy_attackers, light_attackers
 
     def set_factory_type(self, factory):
@@ -619,9 +617,8 @@ class Agent():
 
                 # do I have room to grow lichen?
                 free_spaces_wanted = 10
-                needs_excavation, free_spaces_actual = lichen_surrounded(self.board, factory.strain_id,
-                                                                         self.opp_strains, self.occupied_next,
-                                                                         free_spaces_wanted)
+                needs_excavation, free_spaces_actual = self.lichen_frontier.surrounded(factory.strain_id,
+                                                                                       free_spaces_wanted)
                 primary_zone = get_orthogonal_positions(factory.pos, 2, self.my_factory_tiles, self.board)
                 zone_cost = get_total_rubble(self.board, primary_zone)
                 cost_to_clearing = self.clearing_path_costs[fid]
@@ -702,7 +699,7 @@ class Agent():
             #     emergency_ice_miners = number_of_ice - 1 if number_of_ice - 1 <= 2 else 2
             #     [heavy_todo.append("ice") for _ in range(emergency_ice_miners)]
 
-            closest_enemy = get_closest_factory(self.opp_factories, factory.pos)
+            closest_enemy = self.closest_opp_factory(factory.pos)
             if distance_to(factory.pos, closest_enemy.pos) <= 10 and not need_an_icer:
                 heavy_todo.append("aggro")
 
@@ -764,10 +761,9 @@ class Agent():
             homer_state = None
 
         # don't water if you are surrounded, it won't increase your power anyway
-        surrounded, free_spaces = lichen_surrounded(self.board, factory.strain_id, self.opp_strains, [], 1)
-        lichen_map = self.board['lichen_strains']
-        factory_strain_map = np.argwhere(lichen_map == factory.strain_id)
-        lichen_count = np.count_nonzero(factory_strain_map == 1)
+        surrounded, free_spaces = self.lichen_frontier.surrounded(factory.strain_id, 1)
+        # not the strain's tile count, see StrainLedger.edges
+        lichen_count = self.board["strain_ledger"].edge_count(factory.strain_id)
         if surrounded and lichen_count > 1 and self.step < 700:
             return
 
@@ -884,10 +880,9 @@ class Agent():
                 lowest_rubble_pos = closest_rubble_tile(task_factory.pos, dibbed_tiles, self.board)
             queue = q_builder.build_mining_queue(resource, rubble_tile=lowest_rubble_pos)
         else:
-            off_limits_or_dibbed = list(self.occupied_next)
-            off_limits_or_dibbed.extend(dibbed_tiles)
-            positions_to_clear = next_positions_to_clear(self.board, task_factory.strain_id,
-                                                         self.opp_strains,
+            off_limits_or_dibbed = self.occupied_next.copy()
+            off_limits_or_dibbed.update(dibbed_tiles)
+            positions_to_clear = next_positions_to_clear(self.lichen_frontier, task_factory.strain_id,
                                                          off_limits=off_limits_or_dibbed)
             if len(positions_to_clear) > 0:
                 lowest_rubble_pos = get_position_with_lowest_rubble(positions_to_clear, dibbed_tiles, self.board,
@@ -932,16 +927,16 @@ class Agent():
         number_of_factories = len(self.my_factories)
         need_heavies = number_of_heavies < number_of_factories * 1.5
         enough_water = task_factory.cargo.water >= 100
-        closest_ore = closest_resource_tile('ore', task_factory.pos, [], self.board)
-        if self.step < 400 and need_heavies and enough_water and distance_to(task_factory.pos, closest_ore) < 13:
+        ore_distance = self.static_index.distances["ore"][task_factory.pos[0], task_factory.pos[1]]
+        if self.step < 400 and need_heavies and enough_water and ore_distance < 13:
             return q_builder.build_mining_queue("ore")
         else:
             return q_builder.build_mining_queue("ice")
 
     def icer_task_assignment(self, q_builder, _task, task_factory):
         enough_water = task_factory.cargo.water >= 140
-        closest_ore = closest_resource_tile('ore', task_factory.pos, [], self.board)
-        if self.step < 800 and enough_water and distance_to(task_factory.pos, closest_ore) < 20:
+        ore_distance = self.static_index.distances["ore"][task_factory.pos[0], task_factory.pos[1]]
+        if self.step < 800 and enough_water and ore_distance < 20:
             return q_builder.build_mining_queue("ore")
         else:
             return q_builder.build_mining_queue("ice")
@@ -1227,12 +1222,11 @@ class Agent():
         if len(self.action_queue[unit.unit_id]) > 0 and state == "helping":
             self.check_valid_transfer(unit)
 
-        closest_factory = get_closest_factory(factories, unit.pos)
+        closest_factory = self.closest_my_factory(unit.pos)
         task_factory = closest_factory
         # if you are the closest heavy to a given factory, you need to be doing tasks for that factory
-        heavy_tiles = [u.pos for u in self.my_heavy_units]
         for fid, f in factories.items():
-            closest_heavy = closest_tile_in_group(f.pos, [], heavy_tiles)
+            closest_heavy = closest_tile_in_group(f.pos, [], self.my_heavy_tiles)
             # if closest_heavy is not None and on_tile(unit.pos, closest_heavy):
             has_no_heavies = len(self.factory_tasks_heavy[fid].keys()) == 0
             if closest_heavy is not None and on_tile(unit.pos, closest_heavy) and has_no_heavies:
@@ -1282,15 +1276,15 @@ class Agent():
             q_builder.clear_previous_task()
 
             closest_tile = closest_factory_tile(closest_factory.pos, unit.pos, [])
-            if on_tile(unit.pos, closest_tile) and can_stay(unit.pos, list(self.occupied_next)):
+            if on_tile(unit.pos, closest_tile) and can_stay(unit.pos, self.occupied_next):
                 queue = [unit.transfer(0, 0, unit.cargo.ice)]
                 print(f"Step {self.step}: {unit.unit_id} interrupting queue to transfer water to {task_factory.pos}, queue: {queue}", file=sys.stderr)
                 self.remove_task_from_factory(unit)
                 self.remove_old_next_pos_from_occ_next(unit)
                 self.update_queues(unit, queue)
 
-            elif on_tile(unit.pos, closest_tile) and not can_stay(unit.pos, list(self.occupied_next)):
-                direciton = move_toward(unit.pos, closest_factory.pos, list(self.occupied_next))
+            elif on_tile(unit.pos, closest_tile) and not can_stay(unit.pos, self.occupied_next):
+                direciton = move_toward(unit.pos, closest_factory.pos, self.occupied_next)
                 queue = [unit.move(direciton)]
                 print(f"Step {self.step}: {unit.unit_id} interrupting queue to transfer water to {task_factory.pos}, queue: {queue}", file=sys.stderr)
                 self.remove_task_from_factory(unit)
@@ -1362,7 +1356,7 @@ class Agent():
     def act(self, step: int, obs, remainingOverageTime: int = 60):
         # profiler.enable()
         # initial step setup, these are the basic vars that we need to have
-        game_state = obs_to_game_state(step, self.env_cfg, obs)
+        game_state = self.game_state_store.update(step, obs)
         self.step = game_state.real_env_steps
         # if self.step > 15:
         #     print('f')
@@ -1376,14 +1370,20 @@ class Agent():
         self.board = obs['board']
         self.my_units = units
         self.opp_units = opp_units
+        self.my_unit_table = UnitTable(units)
+        self.opp_unit_table = UnitTable(opp_units)
         self.my_factories = factories
         self.opp_factories = opp_factories
+        self.my_factory_index = get_factory_voronoi(factories, "euclidean")
+        self.opp_factory_index = get_factory_voronoi(opp_factories, "euclidean")
 
 
         # functions that need to be called on each step, mainly to clean the slate from the last step
-        self.new_queue = dict()  # Clear out the new queue from last step
-        self.pop_action_queue()  # Then update the persistent action queue
+        self.pop_action_queue()  # Update the persistent action queue, this also clears the new queue from last step
+        last_opp_factory_tiles = self.opp_factory_tiles
         self.update_occupied_next()  # Update the occupied_next set
+        self.update_path_cache(obs, last_opp_factory_tiles)  # Drop cached paths the new board makes stale
+        self.set_home_fields()  # Cost of getting home from every tile, for every factory
         self.clear_dead_units_from_memory()  # Clear out the dead units from the mining dibs
         self.mining_adjacent = set()  # Clear out the mining adjacent set
         self.helper_treated = set()  # Clear out the helper treated set
@@ -1399,8 +1399,10 @@ class Agent():
 
         # Set opp_strains and paths
         if self.step == 2:
+            self.warm_paths.reset_counters()
             self.set_ore_paths()
             self.set_clearing_paths()
+            print(f"Step {self.step}: warm paths {self.warm_paths}", file=sys.stderr)
             for fid, factory in opp_factories.items():
                 self.opp_strains.append(factory.strain_id)
             i = 0
@@ -1414,10 +1416,10 @@ class Agent():
             self.set_ore_path_costs()
             self.set_clearing_path_costs()
 
-        ice_map, ore_map = self.board["ice"], self.board["ore"]
+        self.lichen_frontier = LichenFrontier(self.board, self.opp_strains)  # shared by every factory this step
         for fid, factory in factories.items():
             # Update the factory's resources, these are the resources which the factory should have control over
-            fact_ice, fact_ore = nearby_resources(factory.pos, ice_map, ore_map, all_factories)
+            fact_ice, fact_ore = nearby_resources(factory.pos, self.board, all_factories)
             self.factory_resources[fid] = [fact_ice, fact_ore]
 
             # then update the factory's type
@@ -1477,13 +1479,14 @@ class Agent():
             self.decision_tree(unit, factories, opp_units)
 
         # FACTORIES
-        for fid, factory in factories.items():
-            if self.step == 1:
-                clearing_position = self.find_clearing_position(factory.pos, 4, 12)
+        if self.step == 1:
+            clearing_positions = self.find_clearing_positions([f.pos for f in factories.values()], 4, 12)
+            for factory, clearing_position in zip(factories.values(), clearing_positions):
                 if clearing_position is not None:
                     # print(f"Step {self.step}: {factory.unit_id} is clearing {clearing_position}", file=sys.stderr)
                     self.factory_clearing_tiles[factory.unit_id] = clearing_position
 
+        for fid, factory in factories.items():
             # I'm thinking these will be the factory functions: factory_construct, factory_water, factory_state
             f_pos = (factory.pos[0], factory.pos[1])
             if f_pos not in self.occupied_next:
@@ -1531,6 +1534,8 @@ class Agent():
                             continue
             self.factory_watering(factory, game_state)
 
+        print(f"Step {self.step}: path cache {self.path_cache}", file=sys.stderr)
+
         # Finalize the action queue and submit it
         finalized_actions = self.finalize_new_queue()
         # profiler.disable()
@@ -0,0 +1,109 @@
+"""
+Compares the array backed A* engine against the original Dijkstra on boards recorded in a replay.
+
+Record a replay with:
+    luxai-s2 main.py main.py --out=replay.json
+then run from the project root:
+    python benchmarks/bench_pathfinding.py replay.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.astar import astar_path, MOVE_COST
+from lib.dijkstra import dijkstras_path
+from lib.utils import get_factory_tiles
+
+
+def load_cases(replay_path, every=25, queries=8, thresholds=(0, 20, 60, 90, 100), seed=0):
+    with open(replay_path, "r") as f:
+        observations = json.load(f)["observations"]
+
+    rng = random.Random(seed)
+    cases = []
+    for step in range(0, len(observations), every):
+        obs = observations[step]
+        if obs["real_env_steps"] < 0:
+            continue
+        rubble = np.array(obs["board"]["rubble"])
+        for player, opp in (("player_0", "player_1"), ("player_1", "player_0")):
+            units = list(obs["units"][player].values())
+            factories = list(obs["factories"][player].values())
+            if not units or not factories:
+                continue
+            occupied = [tuple(u["pos"]) for team in obs["units"].values() for u in team.values()]
+            opp_factory_tiles = [tuple(tile) for f in obs["factories"][opp].values()
+                                 for tile in get_factory_tiles(f["pos"])]
+            for _ in range(queries):
+                start = tuple(rng.choice(units)["pos"])
+                if rng.random() < 0.5:
+                    finish = tuple(rng.choice(factories)["pos"])
+                else:
+                    finish = (rng.randrange(rubble.shape[0]), rng.randrange(rubble.shape[1]))
+                threshold = rng.choice(thresholds)
+                cases.append((rubble, start, finish, occupied, opp_factory_tiles, threshold))
+    return cases
+
+
+def path_cost(rubble, path, threshold):
+    # both engines charge a flat move for the first step and nothing extra for the finish tile
+    total = MOVE_COST if len(path) > 1 else 0
+    for x, y in path[2:-1]:
+        total += MOVE_COST + (rubble[x][y] if rubble[x][y] >= threshold else 0)
+    if len(path) > 2:
+        total += MOVE_COST
+    return total
+
+
+def run(engine, cases, copy_board):
+    paths = []
+    start_time = time.perf_counter()
+    for rubble, start, finish, occupied, opp_factory_tiles, threshold in cases:
+        board = np.copy(rubble) if copy_board else rubble
+        paths.append(engine(board, start, finish, occupied, opp_factory_tiles, rubble_threshold=threshold))
+    return paths, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("replay", help="replay json recorded with luxai-s2 --out=replay.json")
+    parser.add_argument("--every", type=int, default=25, help="sample a board every n steps")
+    parser.add_argument("--queries", type=int, default=8, help="path queries per player per board")
+    args = parser.parse_args()
+
+    cases = load_cases(args.replay, every=args.every, queries=args.queries)
+    old_paths, old_time = run(dijkstras_path, cases, copy_board=True)
+    new_paths, new_time = run(astar_path, cases, copy_board=False)
+
+    cheaper, same, dearer, reach = 0, 0, 0, 0
+    for (rubble, start, finish, occupied, opp_factory_tiles, threshold), old, new in zip(cases, old_paths, new_paths):
+        if bool(old) != bool(new):
+            reach += 1
+            continue
+        if not old:
+            continue
+        old_cost, new_cost = path_cost(rubble, old, threshold), path_cost(rubble, new, threshold)
+        if new_cost < old_cost:
+            cheaper += 1
+        elif new_cost > old_cost:
+            dearer += 1
+        else:
+            same += 1
+
+    print(f"{len(cases)} queries")
+    print(f"dijkstras_path: {old_time:.3f}s ({1000 * old_time / len(cases):.3f}ms per query)")
+    print(f"astar_path:     {new_time:.3f}s ({1000 * new_time / len(cases):.3f}ms per query)")
+    print(f"speedup:        {old_time / new_time:.2f}x")
+    print(f"path cost vs dijkstras_path: {cheaper} cheaper, {same} equal, {dearer} more expensive, "
+          f"{reach} differ in reachability")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import numpy as np
+
+QUEUE_CAPACITY = 20  # the env never keeps more than this many actions for a unit
+MOVE_DELTAS = ((0, 0), (0, -1), (1, 0), (0, 1), (-1, 0))  # (dx, dy) per move direction, 0 stays put
+INT16_MIN, INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+class ActionQueue:
+    """
+    One unit's action queue as a ring buffer of int16 rows, [type, direction, resource, amount, repeat, n].
+    Counting down the front action and popping it are O(1), and next_direction (0 unless the front action is a move)
+    is kept up to date instead of every caller working it out from queue[0].
+    Reads like the list of actions it replaced: len, [i] and [a:b] give lists, and it compares equal to the same list.
+    """
+    __slots__ = ("buffer", "head", "length", "next_direction")
+
+    def __init__(self, actions=()):
+        rows = np.asarray(actions, dtype=np.int64)
+        if rows.size == 0:
+            # [] or a builder's [[]], both an empty queue
+            rows = rows.reshape(0, 6)
+        elif rows.min() < INT16_MIN or rows.max() > INT16_MAX:
+            # numpy wraps out of range ints silently on assignment, an action the env would reject has to fail here
+            raise ValueError(f"action values out of int16 range: {actions}")
+        n = len(rows)
+        self.buffer = np.zeros((max(QUEUE_CAPACITY, n), 6), dtype=np.int16)
+        self.buffer[:n] = rows
+        self.head = 0
+        self.length = n
+        self.set_next_direction()
+
+    def set_next_direction(self):
+        self.next_direction = 0
+        if self.length > 0:
+            front = self.buffer[self.head]
+            if front[0] == 0:
+                self.next_direction = int(front[1])
+
+    def decrement(self) -> bool:
+        # one step of the front action is done, True if that was its last and it got popped
+        front = self.buffer[self.head]
+        front[5] -= 1
+        if front[5] != 0:
+            return False
+        self.head = (self.head + 1) % len(self.buffer)
+        self.length -= 1
+        self.set_next_direction()
+        return True
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.length))]
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("action queue index out of range")
+        return self.buffer[(self.head + i) % len(self.buffer)].tolist()
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ActionQueue):
+            other = other.tolist()
+        return self.tolist() == other
+
+    def tolist(self) -> list:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return repr(self.tolist())
+
+
+class ActionQueueStore:
+    """
+    The agent's unit_id: action queue memory. Units get an ActionQueue, a factory's build or water action is kept as
+    the int it is until the next pop. Anything set can be read back as a list of actions.
+    dirty holds the queues that have to go to the env this step, in the order they were set, so
+    finalize_new_queue reads them straight from here. next_position is cached per unit until its queue changes.
+    """
+    def __init__(self):
+        self.queues = dict()  # uid: ActionQueue, or int for a factory action
+        self.dirty = dict()  # uid: queue to submit this step
+        self.next_positions = dict()  # uid: (x, y) the unit is on after its next action
+
+    def __contains__(self, uid) -> bool:
+        return uid in self.queues
+
+    def __getitem__(self, uid):
+        return self.queues[uid]
+
+    def __setitem__(self, uid, queue):
+        self.next_positions.pop(uid, None)
+        self.queues[uid] = queue if isinstance(queue, int) else ActionQueue(queue)
+
+    def __len__(self) -> int:
+        return len(self.queues)
+
+    def keys(self):
+        return self.queues.keys()
+
+    def submit(self, uid, queue):
+        self.dirty[uid] = queue.tolist() if isinstance(queue, ActionQueue) else queue
+
+    def has_actions(self, uid) -> bool:
+        queue = self.queues.get(uid)
+        return isinstance(queue, ActionQueue) and queue.length > 0
+
+    def next_position(self, unit) -> tuple:
+        # where the unit is after its next action, its current position without one (can be off the map)
+        pos = self.next_positions.get(unit.unit_id)
+        if pos is None:
+            x, y = int(unit.pos[0]), int(unit.pos[1])
+            if self.has_actions(unit.unit_id):
+                dx, dy = MOVE_DELTAS[self.queues[unit.unit_id].next_direction]
+                x, y = x + dx, y + dy
+            pos = (x, y)
+            self.next_positions[unit.unit_id] = pos
+        return pos
+
+    def pop(self) -> list:
+        # start of a step: count down every unit's front action, drop factory actions and queues that were already
+        # empty. Returns the units whose last action just ran out
+        self.dirty = dict()
+        self.next_positions = dict()
+        finished = []
+        for uid in list(self.queues.keys()):
+            queue = self.queues[uid]
+            if isinstance(queue, int) or queue.length == 0:
+                del self.queues[uid]
+            elif queue.decrement() and queue.length == 0:
+                finished.append(uid)
+        return finished
@@ -0,0 +1,183 @@
+from bisect import bisect_left
+from heapq import heappush, heappop
+
+import numpy as np
+
+from lib.grid import get_neighbor_lists, get_neighbor_table
+
+MOVE_COST = 5  # flat cost of a single step, rubble is added on top of this
+OCCUPIED_RADIUS = 2  # occupied_next is only respected this close to the start, further tiles will have moved on
+
+
+class SearchWorkspace:
+    """
+    Flat per-tile search state that is reused between searches instead of being reallocated.
+    Every search bumps the stamp, an entry is only valid for the current search when its stamp matches,
+    so nothing has to be cleared between calls.
+    """
+    def __init__(self, size: int):
+        self.g_score = np.zeros(size, dtype=np.int64)
+        self.parent = np.zeros(size, dtype=np.int64)
+        self.opened = np.zeros(size, dtype=np.int64)
+        self.closed = np.zeros(size, dtype=np.int64)
+        self.blocked = np.zeros(size, dtype=np.int64)
+        self.stamp = 0
+
+    def next_stamp(self) -> int:
+        self.stamp += 1
+        return self.stamp
+
+
+_workspaces = dict()  # board size: SearchWorkspace
+
+
+def get_workspace(size: int) -> SearchWorkspace:
+    if size not in _workspaces:
+        _workspaces[size] = SearchWorkspace(size)
+    return _workspaces[size]
+
+
+def block_tiles(workspace: SearchWorkspace, n_rows: int, n_cols: int, sx: int, sy: int, occupied_next,
+                opp_factory_tiles):
+    # opp factories are always off limits, occupied tiles only near the start
+    stamp, blocked = workspace.stamp, workspace.blocked
+    for pos in opp_factory_tiles:
+        blocked[int(pos[0]) * n_cols + int(pos[1])] = stamp
+    for pos in occupied_next:
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < n_rows and 0 <= y < n_cols and abs(x - sx) + abs(y - sy) <= OCCUPIED_RADIUS:
+            blocked[x * n_cols + y] = stamp
+
+
+def astar_path(rubble_map, start, finish, occupied_next, opp_factory_tiles, rubble_threshold=0, goal_cost=0) -> list:
+    """
+    A* search over the flattened board, drop-in replacement for dijkstras_path.
+    Tiles are packed as x * n_cols + y (see lib/grid.py) and the search state (g-scores, parents, closed flags) lives
+    in flat arrays.
+    Stepping onto a tile costs MOVE_COST plus its rubble, rubble under rubble_threshold is free and the finish tile
+    costs MOVE_COST plus goal_cost. The first step out of start is always just MOVE_COST.
+    rubble_map is only read, never written to, so callers can pass the live board.
+    """
+    n_rows, n_cols = rubble_map.shape
+    sx, sy = int(start[0]), int(start[1])
+    fx, fy = int(finish[0]), int(finish[1])
+    start_idx = sx * n_cols + sy
+    finish_idx = fx * n_cols + fy
+    rubble = rubble_map.reshape(-1)
+
+    workspace = get_workspace(n_rows * n_cols)
+    stamp = workspace.next_stamp()
+    g_score, parent = workspace.g_score, workspace.parent
+    opened, closed, blocked = workspace.opened, workspace.closed, workspace.blocked
+    block_tiles(workspace, n_rows, n_cols, sx, sy, occupied_next, opp_factory_tiles)
+    neighbor_lists = get_neighbor_lists(n_rows, n_cols)
+
+    g_score[start_idx] = 0
+    parent[start_idx] = -1
+    opened[start_idx] = stamp
+    heap = [(MOVE_COST * (abs(sx - fx) + abs(sy - fy)), 0, start_idx)]
+    while heap:
+        _, cost, node = heappop(heap)
+        if node == finish_idx:
+            path = []
+            while node != -1:
+                path.append([node // n_cols, node % n_cols])
+                node = int(parent[node])
+            return path[::-1]
+        if closed[node] == stamp:
+            continue
+        closed[node] = stamp
+
+        for neighbor in neighbor_lists[node]:
+            if closed[neighbor] == stamp or blocked[neighbor] == stamp:
+                continue
+            if node == start_idx:
+                neighbor_cost = cost + MOVE_COST
+            elif neighbor == finish_idx:
+                neighbor_cost = cost + MOVE_COST + goal_cost
+            else:
+                rubble_cost = rubble.item(neighbor)
+                if rubble_cost < rubble_threshold:
+                    rubble_cost = 0
+                neighbor_cost = cost + MOVE_COST + rubble_cost
+            if opened[neighbor] != stamp or neighbor_cost < g_score[neighbor]:
+                opened[neighbor] = stamp
+                g_score[neighbor] = neighbor_cost
+                parent[neighbor] = node
+                nx, ny = divmod(neighbor, n_cols)
+                heappush(heap, (neighbor_cost + MOVE_COST * (abs(nx - fx) + abs(ny - fy)), neighbor_cost, neighbor))
+    return []
+
+
+def truncation_point(profile: list, max_power) -> int:
+    # number of leading path positions that can be walked without dropping to the queue cost
+    return bisect_left(profile, max_power)
+
+
+def last_search_region(n_rows: int, n_cols: int) -> np.ndarray:
+    # bool map of the tiles the last astar_path call looked at, the tiles it expanded and their neighbors
+    # as long as none of these change, running the same search again finds the same path
+    workspace = get_workspace(n_rows * n_cols)
+    expanded = np.flatnonzero(workspace.closed == workspace.stamp)
+    region = np.zeros(n_rows * n_cols, dtype=bool)
+    region[expanded] = True
+    neighbors = get_neighbor_table(n_rows, n_cols)[expanded].ravel()
+    region[neighbors[neighbors >= 0]] = True
+    return region.reshape(n_rows, n_cols)
+
+
+def power_path(rubble_map, start, finish, occupied_next, opp_factory_tiles, unit_cfg, max_power=None) -> tuple:
+    """
+    A* over the power the game actually charges, floor(rubble * RUBBLE_MOVEMENT_COST) + MOVE_COST per tile.
+    Every tile on the path is charged, the start included, same as QueueBuilder.get_path_cost.
+    Returns (path, profile, truncation): profile[i] is what get_path_cost charges for path[:i + 1], queue cost
+    included, and path[:truncation] is the part affordable with max_power (the whole path if max_power is None).
+    """
+    n_rows, n_cols = rubble_map.shape
+    sx, sy = int(start[0]), int(start[1])
+    fx, fy = int(finish[0]), int(finish[1])
+    start_idx = sx * n_cols + sy
+    finish_idx = fx * n_cols + fy
+    rubble = rubble_map.reshape(-1)
+    multiplier, move_cost = unit_cfg.RUBBLE_MOVEMENT_COST, unit_cfg.MOVE_COST
+
+    workspace = get_workspace(n_rows * n_cols)
+    stamp = workspace.next_stamp()
+    g_score, parent = workspace.g_score, workspace.parent
+    opened, closed, blocked = workspace.opened, workspace.closed, workspace.blocked
+    block_tiles(workspace, n_rows, n_cols, sx, sy, occupied_next, opp_factory_tiles)
+    neighbor_lists = get_neighbor_lists(n_rows, n_cols)
+
+    # rubble is never negative so int() floors it
+    start_cost = unit_cfg.ACTION_QUEUE_POWER_COST + int(rubble.item(start_idx) * multiplier) + move_cost
+    g_score[start_idx] = start_cost
+    parent[start_idx] = -1
+    opened[start_idx] = stamp
+    heap = [(start_cost + move_cost * (abs(sx - fx) + abs(sy - fy)), start_cost, start_idx)]
+    while heap:
+        _, cost, node = heappop(heap)
+        if node == finish_idx:
+            path, profile = [], []
+            while node != -1:
+                path.append([node // n_cols, node % n_cols])
+                profile.append(int(g_score[node]))
+                node = int(parent[node])
+            path.reverse()
+            profile.reverse()
+            truncation = len(path) if max_power is None else truncation_point(profile, max_power)
+            return path, profile, truncation
+        if closed[node] == stamp:
+            continue
+        closed[node] = stamp
+
+        for neighbor in neighbor_lists[node]:
+            if closed[neighbor] == stamp or blocked[neighbor] == stamp:
+                continue
+            neighbor_cost = cost + int(rubble.item(neighbor) * multiplier) + move_cost
+            if opened[neighbor] != stamp or neighbor_cost < g_score[neighbor]:
+                opened[neighbor] = stamp
+                g_score[neighbor] = neighbor_cost
+                parent[neighbor] = node
+                nx, ny = divmod(neighbor, n_cols)
+                heappush(heap, (neighbor_cost + move_cost * (abs(nx - fx) + abs(ny - fy)), neighbor_cost, neighbor))
+    return [], [], 0
@@ -0,0 +1,62 @@
+import numpy as np
+
+from lib.grid import BOARD_SIZE
+
+
+class DibsLedger(dict):
+    """
+    The {unit_id: pos} mining dibs, plus a 48x48 count of how many units have dibs on each tile.
+    Claims and releases go through the usual dict operations and keep .claims in step,
+    so asking whether a tile is taken is an array lookup instead of a scan over every unit's dibs.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.claims = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int16)
+        self.update(*args, **kwargs)
+
+    def _claim(self, pos, amount: int):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE:
+            self.claims[x, y] += amount
+
+    def __setitem__(self, uid, pos):
+        if uid in self:
+            self._claim(self[uid], -1)
+        super().__setitem__(uid, pos)
+        self._claim(pos, 1)
+
+    def __delitem__(self, uid):
+        self._claim(self[uid], -1)
+        super().__delitem__(uid)
+
+    def pop(self, uid, *default):
+        if uid in self:
+            self._claim(self[uid], -1)
+        return super().pop(uid, *default)
+
+    def popitem(self):
+        uid, pos = super().popitem()
+        self._claim(pos, -1)
+        return uid, pos
+
+    def setdefault(self, uid, pos=None):
+        if uid not in self:
+            self[uid] = pos
+        return self[uid]
+
+    def update(self, *args, **kwargs):
+        for uid, pos in dict(*args, **kwargs).items():
+            self[uid] = pos
+
+    def clear(self):
+        super().clear()
+        self.claims[:] = 0
+
+    def is_claimed(self, pos) -> bool:
+        x, y = int(pos[0]), int(pos[1])
+        return 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and self.claims[x, y] > 0
+
+    def keep_only(self, uids):
+        # drop the dibs of every unit not in uids, e.g. units that died last turn
+        for uid in [uid for uid in self if uid not in uids]:
+            del self[uid]
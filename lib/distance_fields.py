@@ -0,0 +1,75 @@
+import numpy as np
+
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from lib.grid import get_neighbor_table
+from lib.utils import get_factory_tiles
+
+
+def tile_power_costs(rubble_map: np.ndarray, unit_cfg) -> np.ndarray:
+    # power it takes to move onto each tile, this is what the game actually charges
+    return np.floor(rubble_map * unit_cfg.RUBBLE_MOVEMENT_COST).astype(np.int64) + unit_cfg.MOVE_COST
+
+
+def reverse_move_graph(costs: np.ndarray, blocked: np.ndarray) -> csr_matrix:
+    # edge a -> b is weighted with the cost of entering b, searching it from the factory tiles walks every path backwards
+    n_rows, n_cols = costs.shape
+    n_tiles = n_rows * n_cols
+    sources = np.repeat(np.arange(n_tiles), 4)
+    targets = get_neighbor_table(n_rows, n_cols).ravel()
+    on_board = targets >= 0
+    sources, targets = sources[on_board], targets[on_board]
+    open_tiles = ~blocked.ravel()[targets]
+    sources, targets = sources[open_tiles], targets[open_tiles]
+    weights = costs.ravel()[targets]
+    return csr_matrix((weights, (sources, targets)), shape=(n_tiles, n_tiles))
+
+
+class HomeFields:
+    """
+    Power cost from every tile to the nearest tile of each of my factories, one field per factory per unit type.
+    Built once per step so that cost_home/path_home are a lookup instead of a search per unit.
+    Costs follow QueueBuilder.get_path_cost: every tile on the path is charged, plus the action queue cost.
+    """
+    def __init__(self, rubble_map: np.ndarray, factories: dict, opp_factory_tiles, env_cfg):
+        self.n_rows, self.n_cols = rubble_map.shape
+        self.env_cfg = env_cfg
+        self.costs = dict()  # unit_type: {fid: cost field}
+        self.next_step = dict()  # unit_type: {fid: next tile toward home}
+
+        blocked = np.zeros(rubble_map.shape, dtype=bool)
+        for tile in opp_factory_tiles:
+            blocked[tile[0], tile[1]] = True
+
+        for unit_type in ["LIGHT", "HEAVY"]:
+            unit_cfg = env_cfg.ROBOTS[unit_type]
+            costs = tile_power_costs(rubble_map, unit_cfg)
+            graph = reverse_move_graph(costs, blocked)
+            self.costs[unit_type] = dict()
+            self.next_step[unit_type] = dict()
+            for fid, factory in factories.items():
+                home_tiles = [tile[0] * self.n_cols + tile[1] for tile in get_factory_tiles(factory.pos)]
+                distances, predecessors, _ = dijkstra(graph, indices=home_tiles, min_only=True,
+                                                      return_predecessors=True)
+                # the factory tile you end on is charged too, factory tiles have no rubble so that's a flat move
+                self.costs[unit_type][fid] = distances + unit_cfg.MOVE_COST
+                self.next_step[unit_type][fid] = predecessors
+
+    def cost_home(self, fid: str, unit_type: str, pos) -> int:
+        cost = self.costs[unit_type][fid][pos[0] * self.n_cols + pos[1]]
+        queue_cost = self.env_cfg.ROBOTS[unit_type].ACTION_QUEUE_POWER_COST
+        if np.isinf(cost):
+            return queue_cost  # same as the cost of the empty path you get when there is no way home
+        return int(cost) + queue_cost
+
+    def path_home(self, fid: str, unit_type: str, pos) -> list:
+        node = pos[0] * self.n_cols + pos[1]
+        if np.isinf(self.costs[unit_type][fid][node]):
+            return []
+        next_step = self.next_step[unit_type][fid]
+        path = [[pos[0], pos[1]]]
+        while next_step[node] >= 0:
+            node = next_step[node]
+            path.append([node // self.n_cols, node % self.n_cols])
+        return path
@@ -1,6 +1,7 @@
 # from copy import deepcopy
 
 from lib.evasion_utils import *
+from lib.grid import CARDINAL_LISTS, SECOND_LEVEL_LISTS, pack, pack_checked, next_tile
 from lib.queue_builder import QueueBuilder
 from lib.utils import *
 
@@ -13,18 +14,19 @@ def evasion_check(self, unit, target_factory, opp_units, board):
         threshold = 10
         recharge_rate = 1
 
-    # Tiles of interest
-    cardinal_tiles = get_cardinal_tiles(unit.pos)
-    second_level_tiles = get_second_level_tiles(unit.pos)
+    # Tiles of interest, packed
+    unit_tile = pack(unit.pos)
+    cardinal_tiles = CARDINAL_LISTS[unit_tile]
+    second_level_tiles = SECOND_LEVEL_LISTS[unit_tile]
     evasion_state = "evading"
 
     # Enemy units on tiles of interest
-    danger_close_units, danger_close = get_opp_units_on_tiles(unit, opp_units, cardinal_tiles)
-    danger_far_units, danger_far = get_opp_units_on_tiles(unit, opp_units, second_level_tiles)
+    danger_close_units, danger_close = get_opp_units_on_tiles(unit, self.opp_unit_table, cardinal_tiles)
+    danger_far_units, danger_far = get_opp_units_on_tiles(unit, self.opp_unit_table, second_level_tiles)
 
     # Positions to avoid
-    avoid_positions = list(self.occupied_next)
-    avoid_these_tiles = set()
+    avoid_positions = self.occupied_next.copy()
+    avoid_these_tiles = set()  # packed
 
     # Find the positions that I do not want to move to, append them to avoid_positions
     for oid, opp_unit in danger_far_units.items():
@@ -39,15 +41,17 @@ def evasion_check(self, unit, target_factory, opp_units, board):
 
             # append the tiles to avoid_positions
             for tile in cards_off_limits:
-                avoid_positions.append((tile[0], tile[1]))
-                avoid_these_tiles.add((tile[0], tile[1]))
+                avoid_positions.add(tile)
+                avoid_tile = pack_checked(tile)
+                if avoid_tile >= 0:
+                    avoid_these_tiles.add(avoid_tile)
 
     for oid, opp_unit in danger_close_units.items():
         # if enemy is a heavy, and you are light, avoid the tile they are on
         light_vs_heavy = unit.unit_type == "LIGHT" and opp_unit.unit_type == "HEAVY"
         if light_vs_heavy:
-            avoid_positions.append((opp_unit.pos[0], opp_unit.pos[1]))
-            avoid_these_tiles.add((opp_unit.pos[0], opp_unit.pos[1]))
+            avoid_positions.add(opp_unit.pos)
+            avoid_these_tiles.add(pack(opp_unit.pos))
 
     # # if you are out of power, recharge
     q_builder = QueueBuilder(self, unit, target_factory, board)
@@ -64,10 +68,9 @@ def evasion_check(self, unit, target_factory, opp_units, board):
         # print(f"Step {self.step}: {unit.unit_id} has an action in the queue: {self.action_queue[unit.unit_id]}", file=sys.stderr)
         if self.action_queue[unit.unit_id][0][0] == 0:
             next_dir = self.action_queue[unit.unit_id][0][1]
-            next_pos = next_position(unit.pos, next_dir)
 
             #  if the next position is safe, then continue with the action
-            if (next_pos[0], next_pos[1]) not in avoid_these_tiles:
+            if next_tile(unit_tile, next_dir) not in avoid_these_tiles:
                 # if the queue is an evasion queue, but I'm not in danger anymore, then clear the queue
                 if self.unit_states[unit.unit_id] == "evading" and next_dir != 0:
                     if danger_close:
@@ -109,7 +112,7 @@ def evasion_check(self, unit, target_factory, opp_units, board):
             next_pos = unit.pos
             not_moving = True
         on_my_factory = (next_pos[0], next_pos[1]) in self.my_factory_tiles
-        if ((next_pos[0], next_pos[1]) in avoid_these_tiles or not_moving) and not on_my_factory:
+        if (pack_checked(next_pos) in avoid_these_tiles or not_moving) and not on_my_factory:
             # get the first unit in the danger_close_units, this is *probably* the enemy homer
             opp_id, opp_u = next(iter(danger_close_units.items()))
             queue = q_builder.build_evasion_dance(avoid_positions, cost_home, opp_unit=opp_u)
@@ -1,5 +1,6 @@
 import numpy as np
 
+from lib.grid import pack
 from lib.utils import direction_to, next_position, get_factory_tiles
 
 
@@ -32,19 +33,6 @@ def get_cardinal_tiles_toward(pos: np.ndarray, target: np.ndarray):
         return get_cardinal_tiles_toward_diagonal(pos, target)
 
 
-def get_second_level_tiles(pos: np.ndarray):
-    tiles = np.array([np.array([pos[0], pos[1] + 2]),
-                      np.array([pos[0] + 2, pos[1]]),
-                      np.array([pos[0], pos[1] - 2]),
-                      np.array([pos[0] - 2, pos[1]]),
-                      np.array([pos[0] + 1, pos[1] + 1]),
-                      np.array([pos[0] - 1, pos[1] + 1]),
-                      np.array([pos[0] + 1, pos[1] - 1]),
-                      np.array([pos[0] - 1, pos[1] - 1])
-                      ])
-    return tiles
-
-
 def remove_factory_tiles_from_group(tiles, factories):
     factory_tiles = []
     for fid, factory in factories.items():
@@ -61,22 +49,14 @@ def remove_factory_tiles_from_group(tiles, factories):
 
 
 def get_next_queue_position(unit, action_queue):
-    if len(action_queue) == 0:
-        return unit.pos
-    else:
-        if action_queue[unit.unit_id][0][0] == 0:
-            next_dir = action_queue[unit.unit_id][0][1]
-            return next_position(unit.pos, next_dir)
-        else:
-            return unit.pos
+    # action_queue is the agent's ActionQueueStore
+    return np.array(action_queue.next_position(unit))
 
 
-def get_opp_units_on_tiles(unit, opp_units, tiles):
-    units_on_tiles = dict()
-    tiles = [(tile[0], tile[1]) for tile in tiles]
-    in_danger = False
-    for uid, u in opp_units.items():
-        if (u.pos[0], u.pos[1]) in tiles and (u.unit_type == "HEAVY" or unit.unit_type == "LIGHT"):
-            units_on_tiles[uid] = u
-            in_danger = True
-    return units_on_tiles, in_danger
+def get_opp_units_on_tiles(unit, opp_table, tiles):
+    # tiles are packed, see lib/grid.py, opp_table is the opponent's UnitTable. Heavies only worry about heavies
+    rows = opp_table.on_tiles(tiles)
+    if unit.unit_type != "LIGHT":
+        rows &= opp_table.is_heavy
+    units_on_tiles = opp_table.select(rows)
+    return units_on_tiles, len(units_on_tiles) > 0
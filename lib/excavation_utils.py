@@ -1,60 +1,24 @@
+from lib.grid import NEIGHBORS, mask_lookup, unpack_positions
+from lib.occupancy import as_occupancy
 from lib.utils import *
 
 
-def lichen_surrounded(board, strain_id, opp_strains, off_limits, x) -> (bool, int):
-    lichen_map = board["lichen"]
-    lichen_strains_map = board["lichen_strains"]
-    rubble_map = board["rubble"]
-    ice_map = board["ice"]
-    ore_map = board["ore"]
-    ice_positions = {(i, j) for i, row in enumerate(ice_map) for j, value in enumerate(row) if value == 1}
-    ore_positions = {(i, j) for i, row in enumerate(ore_map) for j, value in enumerate(row) if value == 1}
-
-    combined_positions = ice_positions.union(ore_positions)
-
-    my_lichen_positions = np.argwhere((lichen_strains_map == strain_id) & (lichen_map > 0))
-    off_limits = [tuple(pos) for pos in off_limits]
-
-    # Check if 80% of lichen tiles are above 80, this is a good indicator that the lichen is bordering another strain
-    if np.mean(lichen_map[my_lichen_positions[:, 0], my_lichen_positions[:, 1]] > 80) > 0.9:
-        return True, 0
-
-    free_spaces = 0
-    for pos in my_lichen_positions:
-        x, y = pos
-        neighbors = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))]
-        for nx, ny in neighbors:
-            is_valid_pos = 0 <= nx < 48 and 0 <= ny < 48 and (nx, ny) not in combined_positions
-            if is_valid_pos and rubble_map[nx, ny] == 0 and \
-                    (lichen_strains_map[nx, ny] in opp_strains or lichen_strains_map[nx, ny] == -1):
-                free_spaces += 1
-
-    return (free_spaces < x), free_spaces  # Lichen is considered surrounded if there are less than x free spaces
-
-
-def next_positions_to_clear(board, strain_id, opp_strains, off_limits):
-    lichen_strains_map = board["lichen_strains"]
-    rubble_map = board["rubble"]
+def next_positions_to_clear(frontier, strain_id, off_limits):
+    # rubble tiles next to the strain, see LichenFrontier.rubble_blocked
+    clearable = frontier.rubble_blocked[strain_id] & ~as_occupancy(off_limits).mask \
+        if 0 <= strain_id < len(frontier.rubble_blocked) else np.zeros((48, 48), dtype=bool)
+    if not clearable.any():
+        return np.zeros((0, 2), dtype=np.int64)
 
-    my_lichen_positions = np.argwhere((lichen_strains_map == strain_id))
-    off_limits = [tuple(pos) for pos in off_limits]
-    positions_to_clear = []
-
-    for pos in my_lichen_positions:
-        x, y = pos
-        neighbors = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))]
-
-        for nx, ny in neighbors:
-            is_valid_pos = 0 <= nx < 48 and 0 <= ny < 48 and (nx, ny) not in off_limits
-            if is_valid_pos and rubble_map[nx, ny] > 0:
-                positions_to_clear.append((nx, ny))
-
-    return np.array(positions_to_clear)
+    # neighbors in +x, -x, +y, -y order for every lichen tile, a tile bordering several lichen tiles shows up for each
+    neighbors = NEIGHBORS[frontier.strain_tiles(strain_id)][:, [1, 3, 2, 0]].ravel()
+    positions_to_clear = neighbors[mask_lookup(clearable)[neighbors]]
+    return unpack_positions(positions_to_clear)
 
 
 def get_position_with_lowest_rubble(positions_to_clear, off_limits, board, factory):
     positions_to_clear = [(pos[0], pos[1]) for pos in positions_to_clear]
-    off_limits = [(pos[0], pos[1]) for pos in off_limits]
+    off_limits = as_occupancy(off_limits)
 
     # Filter out off-limits positions
     filtered_positions_to_clear = [pos for pos in positions_to_clear if pos not in off_limits]
@@ -76,27 +40,27 @@ def get_position_with_lowest_rubble(positions_to_clear, off_limits, board, facto
     return filtered_positions_to_clear[min_rubble_index]
 
 
-def get_orthogonal_positions(center, n, off_limits, board):
-    rubble_map = board["rubble"]
-    off_limits = [tuple(pos) for pos in off_limits]
-    x, y = center
-    valid_positions = set()
+_orthogonal_offsets = dict()  # n: (dx, dy) of every tile n away from the 3x3 around a center, in scan order
+
 
-    for dx in range(-1, 2):
-        for dy in range(-1, 2):
-            border_x = x + dx
-            border_y = y + dy
+def get_orthogonal_offsets(n: int) -> np.ndarray:
+    if n not in _orthogonal_offsets:
+        _orthogonal_offsets[n] = np.array([(dx + ddx, dy + ddy) for dx in range(-1, 2) for dy in range(-1, 2)
+                                           for ddx in range(-n, n + 1) for ddy in range(-n, n + 1)
+                                           if abs(ddx) + abs(ddy) == n], dtype=np.int64).reshape(-1, 2)
+    return _orthogonal_offsets[n]
 
-            for ddx in range(-n, n + 1):
-                for ddy in range(-n, n + 1):
-                    if abs(ddx) + abs(ddy) == n:
-                        new_x = border_x + ddx
-                        new_y = border_y + ddy
 
-                        if 0 <= new_x < 48 and 0 <= new_y < 48:
-                            if (new_x, new_y) not in off_limits and rubble_map[new_x, new_y] > 0:
-                                valid_positions.add((new_x, new_y))
+def get_orthogonal_positions(center, n, off_limits, board):
+    # rubble tiles exactly n away from one of the 3x3 tiles around center
+    rubble_map = board["rubble"]
+    candidates = get_orthogonal_offsets(n) + np.array([int(center[0]), int(center[1])])
+    candidates = candidates[((candidates >= 0) & (candidates < 48)).all(1)]
+    valid = ~as_occupancy(off_limits).mask[candidates[:, 0], candidates[:, 1]] & \
+        (rubble_map[candidates[:, 0], candidates[:, 1]] > 0)
 
+    # built in the same order as the old scan, so the set (and the array) come out in the same order too
+    valid_positions = set(map(tuple, candidates[valid].tolist()))
     return np.array(list(valid_positions))
 
 
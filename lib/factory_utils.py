@@ -1,3 +1,5 @@
+from lib.static_index import get_static_index
+from lib.voronoi import get_factory_voronoi
 from lib.utils import *
 
 
@@ -11,33 +13,11 @@ def my_turn_to_place_factory(place_first: bool, step: int):
     return False
 
 
-def nearby_resources(center, ice_map, ore_map, factories, distance=30):
-    ice_tiles = np.argwhere(ice_map == 1)
-    ore_tiles = np.argwhere(ore_map == 1)
-    factory_positions = [f.pos for uid, f in factories.items() if f.pos[0] != center[0] and f.pos[1] != center[1]]
-
-    ice_count = 0
-    for tile in ice_tiles:
-        dist_to_center = distance_to(center, tile)
-        if dist_to_center < distance:
-            is_closest = True
-            for other_factory in factory_positions:
-                if distance_to(other_factory, tile) < dist_to_center:
-                    is_closest = False
-                    break
-            if is_closest:
-                ice_count += 1
-
-    ore_count = 0
-    for tile in ore_tiles:
-        dist_to_center = distance_to(center, tile)
-        if dist_to_center < distance:
-            is_closest = True
-            for other_factory in factory_positions:
-                if distance_to(other_factory, tile) < dist_to_center:
-                    is_closest = False
-                    break
-            if is_closest:
-                ore_count += 1
-
+def nearby_resources(center, board, factories, distance=30):
+    # ice and ore tiles closer than distance to the factory at center that no other factory is closer to
+    static_index = get_static_index(board)
+    voronoi = get_factory_voronoi(factories)
+    i = voronoi.index[(int(center[0]), int(center[1]))]
+    ice_count = int(voronoi.counts_within(static_index.masks["ice"], distance)[i])
+    ore_count = int(voronoi.counts_within(static_index.masks["ore"], distance)[i])
     return ice_count, ore_count
@@ -0,0 +1,99 @@
+import numpy as np
+
+# Tiles are packed into a single int, x * BOARD_SIZE + y, so grid code can index flat arrays and keep plain int sets.
+BOARD_SIZE = 48
+N_TILES = BOARD_SIZE * BOARD_SIZE
+
+# (dx, dy) for directions 1 - 4 (1 = up, 2 = right, 3 = down, 4 = left), same order as the move actions
+DIRECTION_DELTAS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+def pack(pos) -> int:
+    return int(pos[0]) * BOARD_SIZE + int(pos[1])
+
+
+def pack_checked(pos) -> int:
+    # -1 for positions off the map, so they never match a packed tile
+    x, y = int(pos[0]), int(pos[1])
+    if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE:
+        return x * BOARD_SIZE + y
+    return -1
+
+
+def unpack(tile: int) -> tuple:
+    return tile // BOARD_SIZE, tile % BOARD_SIZE
+
+
+def pack_positions(positions) -> np.ndarray:
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    return positions[:, 0] * BOARD_SIZE + positions[:, 1]
+
+
+def unpack_positions(tiles) -> np.ndarray:
+    tiles = np.asarray(tiles, dtype=np.int64)
+    return np.column_stack((tiles // BOARD_SIZE, tiles % BOARD_SIZE))
+
+
+def build_neighbor_table(n_rows: int = BOARD_SIZE, n_cols: int = BOARD_SIZE) -> np.ndarray:
+    # (n_rows * n_cols, 4), column d - 1 is the tile you land on moving in direction d, -1 if that's off the map
+    x, y = np.divmod(np.arange(n_rows * n_cols), n_cols)
+    table = np.full((n_rows * n_cols, 4), -1, dtype=np.int64)
+    for d, (dx, dy) in enumerate(DIRECTION_DELTAS):
+        nx, ny = x + dx, y + dy
+        on_board = (0 <= nx) & (nx < n_rows) & (0 <= ny) & (ny < n_cols)
+        table[on_board, d] = nx[on_board] * n_cols + ny[on_board]
+    return table
+
+
+def build_ring_lists(distance: int) -> list:
+    # every on board tile at exactly this manhattan distance, per tile
+    x, y = np.divmod(np.arange(N_TILES), BOARD_SIZE)
+    offsets = [(dx, dy) for dx in range(-distance, distance + 1) for dy in range(-distance, distance + 1)
+               if abs(dx) + abs(dy) == distance]
+    rings = [[] for _ in range(N_TILES)]
+    for dx, dy in offsets:
+        nx, ny = x + dx, y + dy
+        for tile in np.flatnonzero((0 <= nx) & (nx < BOARD_SIZE) & (0 <= ny) & (ny < BOARD_SIZE)).tolist():
+            rings[tile].append(tile + dx * BOARD_SIZE + dy)
+    return rings
+
+
+# built once on import, before the first observation comes in
+TILE_X, TILE_Y = np.indices((BOARD_SIZE, BOARD_SIZE))  # x and y of every tile on the board
+NEIGHBORS = build_neighbor_table()
+NEIGHBOR_LISTS = [[n for n in row if n >= 0] for row in NEIGHBORS.tolist()]  # on board neighbors only
+CARDINAL_LISTS = [[tile] + neighbors for tile, neighbors in enumerate(NEIGHBOR_LISTS)]  # the tile and its neighbors
+SECOND_LEVEL_LISTS = build_ring_lists(2)
+
+_neighbor_tables = {(BOARD_SIZE, BOARD_SIZE): NEIGHBORS}  # board shape: neighbor table
+_neighbor_lists = {(BOARD_SIZE, BOARD_SIZE): NEIGHBOR_LISTS}  # board shape: neighbor lists
+
+
+def get_neighbor_table(n_rows: int, n_cols: int) -> np.ndarray:
+    if (n_rows, n_cols) not in _neighbor_tables:
+        _neighbor_tables[(n_rows, n_cols)] = build_neighbor_table(n_rows, n_cols)
+    return _neighbor_tables[(n_rows, n_cols)]
+
+
+def get_neighbor_lists(n_rows: int, n_cols: int) -> list:
+    if (n_rows, n_cols) not in _neighbor_lists:
+        table = get_neighbor_table(n_rows, n_cols)
+        _neighbor_lists[(n_rows, n_cols)] = [[n for n in row if n >= 0] for row in table.tolist()]
+    return _neighbor_lists[(n_rows, n_cols)]
+
+
+def next_tile(tile: int, direction: int) -> int:
+    # -1 if the move takes you off the map, direction 0 stays put
+    if direction == 0:
+        return tile
+    return int(NEIGHBORS[tile, direction - 1])
+
+
+def mask_lookup(mask: np.ndarray) -> np.ndarray:
+    # flat copy of a board mask with a trailing False, so indexing it with a neighbor table treats -1 as off limits
+    return np.append(mask.reshape(-1), False)
+
+
+def manhattan_field(pos) -> np.ndarray:
+    # manhattan distance from pos to every tile on the board
+    return np.abs(TILE_X - int(pos[0])) + np.abs(TILE_Y - int(pos[1]))
@@ -0,0 +1,83 @@
+import numpy as np
+
+from lib.grid import BOARD_SIZE
+from lib.static_index import get_static_index
+
+
+def neighbor_count(mask: np.ndarray) -> np.ndarray:
+    # how many of each tile's 4 neighbors are in mask, off the map counts as not
+    mask = mask.astype(np.int64)
+    count = np.zeros_like(mask)
+    count[1:, :] += mask[:-1, :]
+    count[:-1, :] += mask[1:, :]
+    count[:, 1:] += mask[:, :-1]
+    count[:, :-1] += mask[:, 1:]
+    return count
+
+
+def borders(masks: np.ndarray) -> np.ndarray:
+    # tiles next to a tile of the mask (which can be in the mask themselves), works on a single mask or a stack
+    border = np.zeros_like(masks)
+    border[..., 1:, :] |= masks[..., :-1, :]
+    border[..., :-1, :] |= masks[..., 1:, :]
+    border[..., :, 1:] |= masks[..., :, :-1]
+    border[..., :, :-1] |= masks[..., :, 1:]
+    return border
+
+
+class LichenFrontier:
+    """
+    Where every strain's lichen can and can't spread this step, built from a few whole board array ops and shared by
+    all factories, instead of walking each strain's tiles per call.
+    A free space is an open tile (no rubble, no resource, no lichen of mine) next to a tile of growing lichen,
+    counted once for every growing lichen tile it borders.
+    growable is the set of those tiles per strain, rubble_blocked the tiles with rubble next to the strain.
+    """
+    def __init__(self, board, opp_strains):
+        lichen = board["lichen"]
+        self.strains = board["lichen_strains"]
+        self.rubble = board["rubble"]
+        self.open_tiles = ~get_static_index(board).resource_mask & (self.rubble == 0) & \
+            (np.isin(self.strains, opp_strains) | (self.strains == -1))
+
+        # every strain's tiles in row major order, flat_order[starts[s]:starts[s + 1]] are the tiles of strain s
+        flat_strains = self.strains.reshape(-1)
+        strain_tiles = np.flatnonzero(flat_strains >= 0)
+        self.flat_order = strain_tiles[np.argsort(flat_strains[strain_tiles], kind="stable")]
+        n_strains = int(flat_strains.max()) + 1 if len(strain_tiles) > 0 else 0
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(flat_strains[strain_tiles], minlength=n_strains))))
+
+        # per strain numbers for the tiles where lichen is growing
+        growing = (lichen > 0) & (self.strains >= 0)
+        growing_tiles = np.flatnonzero(growing)
+        growing_strains = self.strains[growing]
+        self.lichen_tiles = np.bincount(growing_strains, minlength=n_strains)
+        self.high_lichen_tiles = np.bincount(growing_strains[lichen[growing] > 80], minlength=n_strains)
+        self.free_spaces = np.bincount(growing_strains, weights=neighbor_count(self.open_tiles)[growing],
+                                       minlength=n_strains).astype(np.int64)
+        self.last_lichen_tile = np.full(n_strains, -1)
+        np.maximum.at(self.last_lichen_tile, growing_strains, growing_tiles)
+
+        strain_masks = self.strains[np.newaxis] == np.arange(n_strains)[:, np.newaxis, np.newaxis]
+        self.growable = borders(strain_masks & (lichen > 0)) & self.open_tiles
+        self.rubble_blocked = borders(strain_masks) & (self.rubble > 0)
+
+    def strain_tiles(self, strain_id: int) -> np.ndarray:
+        # packed tiles of the strain, lichen or not, in row major order
+        if not 0 <= strain_id < len(self.starts) - 1:
+            return np.zeros(0, dtype=np.int64)
+        return self.flat_order[self.starts[strain_id]:self.starts[strain_id + 1]]
+
+    def surrounded(self, strain_id: int, x) -> (bool, int):
+        if not 0 <= strain_id < len(self.lichen_tiles) or self.lichen_tiles[strain_id] == 0:
+            return (0 < x), 0
+
+        # Check if 80% of lichen tiles are above 80, this is a good indicator that the lichen is bordering another strain
+        if self.high_lichen_tiles[strain_id] / self.lichen_tiles[strain_id] > 0.9:
+            return True, 0
+
+        # the old per tile loop reused x for the lichen coordinates, so the threshold has always been the x of the last
+        # lichen tile. Keep it that way until the thresholds get re-tuned
+        x = self.last_lichen_tile[strain_id] // BOARD_SIZE
+        free_spaces = int(self.free_spaces[strain_id])
+        return (free_spaces < x), free_spaces  # Lichen is considered surrounded if there are less than x free spaces
@@ -0,0 +1,47 @@
+import numpy as np
+
+from scipy.ndimage import binary_dilation, binary_erosion
+
+_elements = dict()  # (metric, radius): structuring element
+
+
+def structuring_element(metric: str, radius: int) -> np.ndarray:
+    # (2 * radius + 1)^2 bool element, a diamond for "manhattan" and a square for "chebyshev"
+    key = (metric, radius)
+    if key not in _elements:
+        offsets = np.arange(-radius, radius + 1)
+        dx, dy = np.abs(offsets)[:, np.newaxis], np.abs(offsets)[np.newaxis, :]
+        if metric == "manhattan":
+            element = dx + dy <= radius
+        elif metric == "chebyshev":
+            element = np.maximum(dx, dy) <= radius
+        else:
+            raise ValueError(f"unknown metric {metric}")
+        element.setflags(write=False)
+        _elements[key] = element
+    return _elements[key]
+
+
+def dilate(mask: np.ndarray, radius: int, metric: str = "manhattan") -> np.ndarray:
+    # every tile within radius of a tile in mask, nothing comes in from off the map
+    mask = np.asarray(mask, dtype=bool)
+    if radius <= 0:
+        return mask.copy()
+    return binary_dilation(mask, structure=structuring_element(metric, radius))
+
+
+def erode(mask: np.ndarray, radius: int, metric: str = "manhattan", border_value: int = 0) -> np.ndarray:
+    # tiles whose whole neighborhood within radius is in mask, off the map counts as border_value
+    mask = np.asarray(mask, dtype=bool)
+    if radius <= 0:
+        return mask.copy()
+    return binary_erosion(mask, structure=structuring_element(metric, radius), border_value=border_value)
+
+
+def positions_mask(positions, shape=(48, 48)) -> np.ndarray:
+    # bool map with the given (x, y) positions set, positions off the map are left out
+    mask = np.zeros(shape, dtype=bool)
+    positions = np.asarray([(pos[0], pos[1]) for pos in positions], dtype=np.int64).reshape(-1, 2)
+    on_board = (positions >= 0).all(1) & (positions[:, 0] < shape[0]) & (positions[:, 1] < shape[1])
+    mask[positions[on_board, 0], positions[on_board, 1]] = True
+    return mask
@@ -0,0 +1,85 @@
+import numpy as np
+
+from lib.grid import BOARD_SIZE
+
+
+class OccupancyGrid:
+    """
+    A set of board tiles backed by a 48x48 bool array, used in place of the sets of (x, y) tuples the agent keeps
+    per step (occupied_next, factory tiles, threat tiles).
+    add/remove/in are single array lookups and .mask is the whole layer for vectorized work.
+    Tiles off the map are never members, adding one does nothing.
+    """
+    def __init__(self, tiles=None):
+        self.mask = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=bool)
+        self.count = 0
+        if tiles is not None:
+            self.update(tiles)
+
+    def __contains__(self, pos) -> bool:
+        x, y = int(pos[0]), int(pos[1])
+        return 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and bool(self.mask[x, y])
+
+    def __iter__(self):
+        for x, y in np.argwhere(self.mask).tolist():
+            yield x, y
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, OccupancyGrid):
+            return NotImplemented
+        return np.array_equal(self.mask, other.mask)
+
+    def add(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and not self.mask[x, y]:
+            self.mask[x, y] = True
+            self.count += 1
+
+    def discard(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < BOARD_SIZE and 0 <= y < BOARD_SIZE and self.mask[x, y]:
+            self.mask[x, y] = False
+            self.count -= 1
+
+    def remove(self, pos):
+        if pos not in self:
+            raise KeyError(pos)
+        self.discard(pos)
+
+    def update(self, tiles):
+        if isinstance(tiles, OccupancyGrid):
+            self.merge_mask(tiles.mask)
+            return
+        positions = np.asarray([(pos[0], pos[1]) for pos in tiles], dtype=np.int64).reshape(-1, 2)
+        on_board = (positions >= 0).all(1) & (positions < BOARD_SIZE).all(1)
+        positions = positions[on_board]
+        self.mask[positions[:, 0], positions[:, 1]] = True
+        self.count = int(np.count_nonzero(self.mask))
+
+    def merge_mask(self, mask: np.ndarray):
+        self.mask |= mask
+        self.count = int(np.count_nonzero(self.mask))
+
+    def copy(self):
+        grid = OccupancyGrid()
+        grid.mask = self.mask.copy()
+        grid.count = self.count
+        return grid
+
+    def clear(self):
+        self.mask[:] = False
+        self.count = 0
+
+    def positions(self) -> np.ndarray:
+        # (n, 2) array of the member tiles in row major order
+        return np.argwhere(self.mask)
+
+
+def as_occupancy(tiles) -> OccupancyGrid:
+    # helpers take either a grid or any list/set of positions, only the latter has to be converted
+    if isinstance(tiles, OccupancyGrid):
+        return tiles
+    return OccupancyGrid(tiles)
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+from lib.astar import OCCUPIED_RADIUS
+
+
+class PathCache:
+    """
+    LRU cache of found paths, keyed on (start, finish, unit type, rubble threshold, occupancy signature).
+    The threshold slot is "power" for paths found by power_path, those also keep their power profile.
+    The occupancy signature is the set of occupied tiles close enough to the start for the search to respect them,
+    so two queries with the same key always search the same board apart from rubble.
+    An entry is dropped when rubble changes on one of its tiles, see invalidate_tiles.
+    """
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self.paths = OrderedDict()  # key: path
+        self.profiles = dict()  # key: power profile, only for paths found by power_path
+        self.tile_keys = dict()  # (x, y): {keys of paths through this tile}
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def make_key(start, finish, unit_type: str, rubble_threshold, occupied_next) -> tuple:
+        sx, sy = int(start[0]), int(start[1])
+        signature = frozenset((int(pos[0]), int(pos[1])) for pos in occupied_next
+                              if abs(pos[0] - sx) + abs(pos[1] - sy) <= OCCUPIED_RADIUS)
+        return (sx, sy), (int(finish[0]), int(finish[1])), unit_type, rubble_threshold, signature
+
+    def get(self, key: tuple):
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.paths.move_to_end(key)
+        return [[x, y] for x, y in path]
+
+    def get_profile(self, key: tuple) -> list:
+        # call after a get hit
+        return list(self.profiles[key])
+
+    def put(self, key: tuple, path: list, profile: list = None):
+        if key in self.paths:
+            self.remove(key)
+        path = [(int(pos[0]), int(pos[1])) for pos in path]
+        self.paths[key] = path
+        if profile is not None:
+            self.profiles[key] = tuple(profile)
+        for tile in path:
+            self.tile_keys.setdefault(tile, set()).add(key)
+        while len(self.paths) > self.max_size:
+            self.remove(next(iter(self.paths)))
+
+    def remove(self, key: tuple):
+        path = self.paths.pop(key)
+        self.profiles.pop(key, None)
+        for tile in path:
+            keys = self.tile_keys.get(tile)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tile_keys[tile]
+
+    def invalidate_tiles(self, tiles):
+        # tiles whose rubble changed since the last step
+        for tile in tiles:
+            keys = self.tile_keys.get(tile)
+            if keys:
+                for key in list(keys):
+                    self.remove(key)
+                    self.invalidated += 1
+
+    def clear(self):
+        self.paths.clear()
+        self.profiles.clear()
+        self.tile_keys.clear()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __str__(self):
+        return f"{self.hits} hits, {self.misses} misses, {self.invalidated} invalidated, {len(self.paths)} cached"
@@ -1,6 +1,8 @@
 # from math import floor
 # from copy import deepcopy
-from lib.dijkstra import dijkstras_path
+from lib.astar import astar_path, power_path, truncation_point
+from lib.occupancy import OccupancyGrid
+from lib.static_index import get_static_index
 from lib.utils import *
 
 
@@ -31,20 +33,18 @@ class QueueBuilder:
 
         # DIBS
         dibs = self.get_dibs_class()
-        dibs_tiles = [tile for uid, tile in dibs.items()]
+        dibs_ledgers = [dibs]
 
         if self.unit.unit_type == "LIGHT":
             factory_tasks_weight_class = self.agent.factory_tasks_light
-            heavy_dibs = [tile for uid, tile in self.agent.heavy_mining_dibs.items()]
-            dibs_tiles.extend(heavy_dibs)
+            dibs_ledgers.append(self.agent.heavy_mining_dibs)
         else:
             factory_tasks_weight_class = self.agent.factory_tasks_heavy
             # if you're digging rubble or lichen, avoid the lights that are doing the same
             # you might accidentally mine a tile that a light finished off while you were moving
             # plus it avoids congestion while digging rubble/lichen
             if rubble_tile is not None or lichen_tile is not None:
-                light_dibs = [tile for uid, tile in self.agent.light_mining_dibs.items()]
-                dibs_tiles.extend(light_dibs)
+                dibs_ledgers.append(self.agent.light_mining_dibs)
 
         # TARGET TILE
         target_factory = self.target_factory
@@ -56,11 +56,14 @@ class QueueBuilder:
             resource_tile = lichen_tile
             tile_amount = self.board["lichen"][resource_tile[0]][resource_tile[1]]
         else:
+            heavy_tiles = []
             if self.unit.unit_type == "HEAVY" and not_a_homer and not_an_icer:
                 # if you're a heavy, don't swipe a mining tile form another heavy just because you have a lower uid than them
-                heavy_tiles = [u.pos for u in self.agent.my_heavy_units if u.unit_id != self.unit.unit_id]
-                dibs_tiles.extend(heavy_tiles)
-            resource_tile = closest_resource_tile(resource, target_factory.pos, dibs_tiles, self.board)
+                heavy_table = self.agent.my_heavy_table
+                heavy_tiles = heavy_table.positions(heavy_table.other_than(self.unit.unit_id))
+            free_tiles = get_static_index(self.board).nearest_free(resource, target_factory.pos, ledgers=dibs_ledgers,
+                                                                   exclude=heavy_tiles)
+            resource_tile = free_tiles[0] if len(free_tiles) > 0 else None
             tile_amount = None
 
         if resource_tile is None:
@@ -90,8 +93,7 @@ class QueueBuilder:
             return queue
 
         # start position is the position after the transfer queue, it may not be different from unit.pos
-        path_to_resource = self.get_path_positions(start_postition, resource_tile)
-        cost_to_resource = self.get_path_cost(path_to_resource)
+        path_to_resource, cost_to_resource, _ = self.get_power_path(start_postition, resource_tile)
         if not path_to_resource:
             return None
 
@@ -99,8 +101,7 @@ class QueueBuilder:
         heavies = [unit for unit in self.agent.my_heavy_units if unit.unit_id != self.unit.unit_id]
         return_tile = closest_factory_tile(target_factory.pos, resource_tile, heavies)
 
-        path_from_resource = self.get_path_positions(resource_tile, return_tile)
-        cost_from_resource = self.get_path_cost(path_from_resource)
+        path_from_resource, cost_from_resource, _ = self.get_power_path(resource_tile, return_tile)
 
         # COST
         reserve_power = self.agent.moderate_reserve_power[self.unit.unit_type]
@@ -171,7 +172,7 @@ class QueueBuilder:
         self.clear_aggro_dibs()
         endgame = self.agent.step > 500
 
-        closest_factory = get_closest_factory(self.agent.my_factories, self.unit.pos)
+        closest_factory = self.agent.closest_my_factory(self.unit.pos)
         target_factory = closest_factory
 
         enough_power = 2000 if self.unit.unit_type == "HEAVY" else 1000
@@ -209,7 +210,7 @@ class QueueBuilder:
             dibbed_tiles.extend(pos_list)
 
         # PATHS AND COSTS
-        path_to_lichen = self.get_path_positions(position, lichen_tile)
+        path_to_lichen, cost_to_lichen, affordable = self.get_power_path(position, lichen_tile, max_power=max_power)
         if (not path_to_lichen or len(path_to_lichen) <= 1) and not on_tile(self.unit.pos, lichen_tile):
             # lichen_tile = closest_opp_lichen(self.agent.opp_strains, self.unit.pos, dibbed_tiles, self.board)
             # if lichen_tile is None:
@@ -228,7 +229,6 @@ class QueueBuilder:
 
         cost_from_lichen = 0
         return_path = []
-        cost_to_lichen = self.get_path_cost(path_to_lichen)
         # if not endgame and self.unit.unit_type == "HEAVY":
         #     # first try the target factory
         #     path_from_lichen = self.get_path_positions(lichen_tile, target_factory.pos)
@@ -262,7 +262,7 @@ class QueueBuilder:
                     print(
                         f'Step {self.agent.step}: {self.unit.unit_id} is attacking {lichen_tile} but its too expensive: {total_cost}, trekking',
                         file=sys.stderr)
-                    queue = self.build_trekking_queue(path_to_lichen, max_power=max_power)
+                    queue = self.build_trekking_queue(path_to_lichen[:affordable])
                     return queue
                 # print(
                 #     f'Step {self.agent.step}: {self.unit.unit_id} is attacking {lichen_tile} but its too expensive: {total_cost}',
@@ -320,8 +320,7 @@ class QueueBuilder:
                 break
 
             # PATHS AND COSTS
-            path_to_lichen = self.get_path_positions(position, lichen_tile)
-            cost_to_lichen = self.get_path_cost(path_to_lichen)
+            path_to_lichen, cost_to_lichen, _ = self.get_power_path(position, lichen_tile)
             if not endgame and self.unit.unit_type == "HEAVY":
                 path_home_tile = closest_tile_in_group(lichen_tile, [], return_path)
                 if path_home_tile is not None:
@@ -399,9 +398,8 @@ class QueueBuilder:
         #     lichen_tile = closest_opp_lichen(self.agent.opp_strains, self.unit.pos, dibbed_tiles, self.board, priority=True)
         # lichen_tile = closest_opp_lichen(self.agent.opp_strains, self.unit.pos, dibbed_tiles, self.board, priority=True, group=lichen_group)
 
-    def build_trekking_queue(self, path_positions, max_power=0):
-        # get the path_positions for the amount of path that you can afford given your power
-        affordable_path = self.get_path_cost(path_positions, max_power=max_power)
+    def build_trekking_queue(self, affordable_path):
+        # affordable_path is the part of the path you can afford given your power, see get_power_path
         if not affordable_path or len(affordable_path) <= 1:
             return None
         queue = self.get_path_moves(affordable_path, pauses=5)
@@ -433,12 +431,13 @@ class QueueBuilder:
         mining_tile = closest_resource_tile("ice", undibbed_factory.pos, [], self.board)
         cardinal_tiles = get_cardinal_tiles(mining_tile)
         target_tile = closest_tile_in_group(self.unit.pos, self.agent.opp_factory_tiles, cardinal_tiles)
-        if on_tile(self.unit.pos, target_tile) and can_stay(self.unit.pos, list(self.agent.occupied_next)):
+        if on_tile(self.unit.pos, target_tile) and can_stay(self.unit.pos, self.agent.occupied_next):
             queue = [self.unit.move(0, n=25)]
             return queue
 
-        path = self.get_path_positions(self.unit.pos, mining_tile)
-        path_back = self.get_path_positions(mining_tile, self.target_factory.pos, occupied=self.agent.opp_factory_tiles)
+        path, path_cost, _ = self.get_power_path(self.unit.pos, mining_tile)
+        path_back, path_back_cost, _ = self.get_power_path(mining_tile, self.target_factory.pos,
+                                                           occupied=self.agent.opp_factory_tiles)
         if path is None or len(path) <= 1:
             print(f"Step {self.agent.step}: {self.unit.unit_id} cant find aggro path to {undibbed_factory.unit_id}", file=sys.stderr)
             return None
@@ -446,8 +445,6 @@ class QueueBuilder:
             print(f"Step {self.agent.step}: {self.unit.unit_id} cant find aggro path back to {self.target_factory.unit_id}", file=sys.stderr)
             return None
 
-        path_cost = self.get_path_cost(path)
-        path_back_cost = self.get_path_cost(path_back)
         reserve_power = 150
         aggro_allowance = 400
         total_cost = path_cost + path_back_cost + aggro_allowance + reserve_power
@@ -456,7 +453,7 @@ class QueueBuilder:
             if total_cost > 2999:
                 return None
             print(f"Step {self.agent.step}: {self.unit.unit_id} cant afford aggro path to {undibbed_factory.unit_id}, cost: {total_cost}, power: {self.unit.power}", file=sys.stderr)
-            closest_factory = get_closest_factory(self.agent.my_factories, self.unit.pos)
+            closest_factory = self.agent.closest_my_factory(self.unit.pos)
             if distance_to(self.unit.pos, closest_factory.pos) < 6:
                 queue = self.build_recharge_queue()
             else:
@@ -532,11 +529,9 @@ class QueueBuilder:
 
         # get path home
         if occupied is not None:
-            path_home = self.get_path_positions(self.unit.pos, return_tile, occupied=occupied)
-            cost_home = self.get_path_cost(path_home)
+            path_home, cost_home, _ = self.get_power_path(self.unit.pos, return_tile, occupied=occupied)
         else:
-            path_home = self.get_path_positions(self.unit.pos, return_tile)
-            cost_home = self.get_path_cost(path_home)
+            path_home, cost_home, _ = self.get_power_path(self.unit.pos, return_tile)
         if not path_home:
             queue = self.build_waiting_queue(length=4)
             return queue
@@ -569,11 +564,10 @@ class QueueBuilder:
                 return queue
 
             else:
-                closest_factory = get_closest_factory(self.agent.my_factories, self.unit.pos)
+                closest_factory = self.agent.closest_my_factory(self.unit.pos)
                 if closest_factory.unit_id != target_factory.unit_id:
                     target_factory = closest_factory
-                    path_home = self.get_path_positions(self.unit.pos, target_factory.pos)
-                    cost_home = self.get_path_cost(path_home)
+                    path_home, cost_home, _ = self.get_power_path(self.unit.pos, target_factory.pos)
                 if self.unit.power < cost_home:
 
                     if in_danger:
@@ -647,10 +641,9 @@ class QueueBuilder:
             resource_tile = homer.pos
         target_tile = get_helper_tile(resource_tile, self.target_factory.pos)
         if not on_tile(trans_pos, target_tile):
-            positions_to_target = self.get_path_positions(trans_pos, target_tile)
+            positions_to_target, cost_to_target, _ = self.get_power_path(trans_pos, target_tile)
             if len(positions_to_target) == 0:
                 return None
-            cost_to_target = self.get_path_cost(positions_to_target)
             if self.unit.power < cost_to_target:
                 queue = self.build_low_battery_queue(cost_to_target - self.unit.power)
             moves_to_target = self.get_path_moves(positions_to_target)
@@ -736,13 +729,9 @@ class QueueBuilder:
         self.clear_aggro_dibs()
 
         outer_adjacent_tiles = get_outer_adjacent_tiles(factory.pos)
-        occupied_or_resources = [u.pos for u in self.agent.my_heavy_units if u.unit_id != self.unit.unit_id]
-        ice = self.board['ice']
-        ore = self.board['ore']
-        ice_positions = np.column_stack(np.where(ice == 1))
-        ore_positions = np.column_stack(np.where(ore == 1))
-        occupied_or_resources.extend(ice_positions)
-        occupied_or_resources.extend(ore_positions)
+        heavy_table = self.agent.my_heavy_table
+        occupied_or_resources = OccupancyGrid(heavy_table.positions(heavy_table.other_than(self.unit.unit_id)))
+        occupied_or_resources.merge_mask(get_static_index(self.board).resource_mask)
 
         closest_tile = closest_tile_in_group(self.unit.pos, occupied_or_resources, outer_adjacent_tiles)
         if closest_tile is None:
@@ -760,12 +749,11 @@ class QueueBuilder:
             return queue
 
         if not on_tile(self.unit.pos, closest_tile):
-            positions_to_target = self.get_path_positions(self.unit.pos, closest_tile)
+            positions_to_target, cost_to_target, _ = self.get_power_path(self.unit.pos, closest_tile)
             if not positions_to_target:
                 print(f"Step {self.agent.step}: {self.unit.unit_id} is stuck in solar panel queue. no path to target",
                       file=sys.stderr)
                 return None
-            cost_to_target = self.get_path_cost(positions_to_target)
             if cost_to_target > self.unit.power:
                 queue = self.build_waiting_queue(length=13)
                 return queue
@@ -790,21 +778,16 @@ class QueueBuilder:
         self.clear_lichen_dibs()
 
         # do not wait on a resource tile
-        closest_factory = get_closest_factory(self.agent.my_factories, self.unit.pos)
-        occupied_or_resources = list(self.agent.occupied_next)
-        occupied_or_resources.append(closest_factory.pos)
-        ice = self.board['ice']
-        ore = self.board['ore']
-        ice_positions = np.column_stack(np.where(ice == 1))
-        ore_positions = np.column_stack(np.where(ore == 1))
-        occupied_or_resources.extend(ice_positions)
-        occupied_or_resources.extend(ore_positions)
+        closest_factory = self.agent.closest_my_factory(self.unit.pos)
+        occupied_or_resources = self.agent.occupied_next.copy()
+        occupied_or_resources.add(closest_factory.pos)
+        occupied_or_resources.merge_mask(get_static_index(self.board).resource_mask)
 
         if can_stay(self.unit.pos, occupied_or_resources):
             queue = [self.unit.move(0, n=length)]
         else:
-            occupied_next = list(self.agent.occupied_next)
-            occupied_next.append(closest_factory.pos)
+            occupied_next = self.agent.occupied_next.copy()
+            occupied_next.add(closest_factory.pos)
             direction = move_toward(self.unit.pos, self.target_factory.pos, occupied_next)
             # print(f"Step {self.agent.step}: {self.unit.unit_id} is waiting but can't stay in place, moving in direction {direction}",
             #       file=sys.stderr)
@@ -892,9 +875,9 @@ class QueueBuilder:
             factory = self.target_factory
         reserve_power = self.agent.low_reserve_power[self.unit.unit_type]
 
-        closest_charge_tile = closest_factory_tile(factory.pos, self.unit.pos, self.agent.my_heavy_units)
-        path_home = self.get_path_positions(self.unit.pos, closest_charge_tile)
-        cost_home = self.get_path_cost(path_home)
+        home_fields = self.agent.home_fields
+        path_home = home_fields.path_home(factory.unit_id, self.unit.unit_type, self.unit.pos)
+        cost_home = home_fields.cost_home(factory.unit_id, self.unit.unit_type, self.unit.pos)
 
         if self.unit.power <= cost_home + reserve_power:
             return True, path_home, cost_home
@@ -913,8 +896,7 @@ class QueueBuilder:
 
             # find the optimal factory
             if factory.power > most_power + 2000:
-                path_to_factory = self.get_path_positions(self.unit.pos, factory.pos, recharging=True)
-                cost_to_factory = self.get_path_cost(path_to_factory)
+                path_to_factory, cost_to_factory, _ = self.get_power_path(self.unit.pos, factory.pos, recharging=True)
                 if cost_to_factory < self.unit.power + reserve_power:
                     most_power = factory.power
                     optimal_factory = factory
@@ -934,7 +916,7 @@ class QueueBuilder:
         if home_pref:
             charge_factory = self.target_factory
         else:
-            charge_factory = get_closest_factory(self.agent.my_factories, position)
+            charge_factory = self.agent.closest_my_factory(position)
         # other_heavies = [u for u in self.agent.my_heavy_units if u.unit_id != self.unit.unit_id]
         target_factory_tile = closest_factory_tile(charge_factory.pos, position, [])
         pos = (position[0], position[1])
@@ -962,7 +944,7 @@ class QueueBuilder:
         if home_pref:
             target_factory = self.target_factory
         else:
-            target_factory = get_closest_factory(self.agent.my_factories, self.unit.pos)
+            target_factory = self.agent.closest_my_factory(self.unit.pos)
 
         queue = []
         cost = 0
@@ -1085,7 +1067,7 @@ class QueueBuilder:
         # print(f"Step {self.agent.step}: {self.unit.unit_id} is picking up {pickup_amt} from {charge_factory.unit_id}", file=sys.stderr)
         return pickup_amt
 
-    def get_path_cost(self, path_positions: list, type=None, max_power=None) -> int or list:
+    def get_path_cost(self, path_positions: list, type=None) -> int:
         if type is None:
             type = self.unit.unit_type
 
@@ -1100,17 +1082,6 @@ class QueueBuilder:
 
         rubble_map = self.board["rubble"]
 
-        if max_power is not None:
-            path = []
-            power_remaining = max_power
-            for pos in path_positions:
-                rubble_cost = floor(rubble_map[pos[0]][pos[1]] * multiplier)
-                power_remaining -= rubble_cost + move_cost
-                if power_remaining <= queue_cost:
-                    break
-                path.append(pos)
-            return path
-
         total_cost = 0
         for pos in path_positions:
             rubble_cost = floor(rubble_map[pos[0]][pos[1]] * multiplier)
@@ -1127,27 +1098,12 @@ class QueueBuilder:
         #         occupied_next.add((tile[0], tile[1]))
 
         for uid, u in group.items():
-            if u.unit_id in self.agent.action_queue.keys():
-                queue = self.agent.action_queue[u.unit_id]
-                # if you have an action queue, check the next position
-                if isinstance(queue, list) and len(queue) > 0:
-                    # if you're moving, next_pos is the next position
-                    if queue[0][0] == 0:
-                        next_pos = next_position(u.pos, queue[0][1])
-                        new_pos = (next_pos[0], next_pos[1])
-                    # otherwise, next_pos is the current position
-                    else:
-                        new_pos = (u.pos[0], u.pos[1])
-                    # add new_pos to occupied_next
-                    occupied_next.add(new_pos)
-                # if you don't have an action queue, add the current position to occupied_next
-                else:
-                    pos = (u.pos[0], u.pos[1])
-                    occupied_next.add(pos)
+            # the next position if you have an action queue, the current position if you don't
+            if u.unit_id in self.agent.action_queue:
+                occupied_next.add(self.agent.action_queue.next_position(u))
         return occupied_next
 
-    def get_path_positions(self, start: np.ndarray, finish: np.ndarray, recharging=False, occupied=None) -> list:
-        rubble_map = np.copy(self.board["rubble"])
+    def get_path_occupied(self, recharging=False, occupied=None) -> list:
         if occupied is None:
             if self.unit.unit_type == "HEAVY":
                 units = self.agent.my_units
@@ -1158,7 +1114,8 @@ class QueueBuilder:
                     heavies = {uid: u for uid, u in units.items() if uid in factory_homers.values() and uid != unit_id}
                     helpers_next = []
                 else:
-                    heavies = {uid: u for uid, u in units.items() if uid != unit_id and u.unit_type == "HEAVY"}
+                    unit_table = self.agent.my_unit_table
+                    heavies = unit_table.select(unit_table.is_heavy & unit_table.other_than(unit_id))
                     unit_states = {uid: u for uid, u in units.items() if uid in self.agent.unit_states.keys()}
                     helpers = {uid: u for uid, u in unit_states.items() if self.agent.unit_states[uid] == "helping"}
                     helpers_next = list(self.get_occupied_next_for_group(helpers))
@@ -1171,16 +1128,23 @@ class QueueBuilder:
             occupied_next = list(occupied)
 
         if recharging or self.unit.unit_type == "LIGHT":
-            opp_heavy_positions = [u.pos for uid, u in self.agent.opp_units.items() if u.unit_type == "HEAVY"]
-            occupied_next.extend(opp_heavy_positions)
-            for pos in opp_heavy_positions:
-                cardinal_tiles = get_cardinal_tiles(pos)
-                occupied_next.extend(cardinal_tiles)
+            occupied_next.extend(self.agent.threat_tiles)
+        return occupied_next
+
+    def get_path_positions(self, start: np.ndarray, finish: np.ndarray, recharging=False, occupied=None) -> list:
+        rubble_map = self.board["rubble"]
+        occupied_next = self.get_path_occupied(recharging=recharging, occupied=occupied)
+        path_cache = self.agent.path_cache
+        cache_key = path_cache.make_key(start, finish, self.unit.unit_type, 20, occupied_next)
+        fast_path = path_cache.get(cache_key)
+        if fast_path is not None:
+            return fast_path
 
         opp_factory_tiles = list(self.agent.opp_factory_tiles)
-        # cheap_path = dijkstras_path(rubble_map, start, finish, occupied_next, opp_factory_tiles)
+        # cheap_path = astar_path(rubble_map, start, finish, occupied_next, opp_factory_tiles)
         # return cheap_path
-        fast_path = dijkstras_path(rubble_map, start, finish, occupied_next, opp_factory_tiles, rubble_threshold=20)
+        fast_path = astar_path(rubble_map, start, finish, occupied_next, opp_factory_tiles, rubble_threshold=20)
+        path_cache.put(cache_key, fast_path)
         # if fast_path is not None and cheap_path is not None:
         #     fast_cost = self.get_path_cost(fast_path)
         #     cheap_cost = self.get_path_cost(cheap_path)
@@ -1191,6 +1155,26 @@ class QueueBuilder:
         #     return cheap_path
         return fast_path
 
+    def get_power_path(self, start: np.ndarray, finish: np.ndarray, recharging=False, occupied=None,
+                       max_power=None) -> tuple:
+        # cheapest path by actual power, returns (path, cost, truncation), path[:truncation] is affordable with max_power
+        rubble_map = self.board["rubble"]
+        unit_cfg = self.agent.env_cfg.ROBOTS[self.unit.unit_type]
+        occupied_next = self.get_path_occupied(recharging=recharging, occupied=occupied)
+        path_cache = self.agent.path_cache
+        cache_key = path_cache.make_key(start, finish, self.unit.unit_type, "power", occupied_next)
+        path = path_cache.get(cache_key)
+        if path is not None:
+            profile = path_cache.get_profile(cache_key)
+            truncation = len(path) if max_power is None else truncation_point(profile, max_power)
+        else:
+            opp_factory_tiles = list(self.agent.opp_factory_tiles)
+            path, profile, truncation = power_path(rubble_map, start, finish, occupied_next, opp_factory_tiles,
+                                                   unit_cfg, max_power=max_power)
+            path_cache.put(cache_key, path, profile)
+        cost = profile[-1] if profile else unit_cfg.ACTION_QUEUE_POWER_COST
+        return path, cost, truncation
+
     def get_path_moves(self, path_positions: list, pauses=None) -> list:
         moves = []
         for i, pos in enumerate(path_positions):
@@ -1,8 +1,7 @@
 from math import floor
 import sys
 
-from lux.kit import obs_to_game_state
-from lib.utils import manhattan_dist_to_nth_closest, closest_resource_tile, distance_to
+from lib.utils import manhattan_distance_stack, closest_resource_tile, distance_to
 from lib.factory_utils import my_turn_to_place_factory
 from lib.setup_utils import *
 
@@ -11,7 +10,7 @@ def setup(self, step: int, obs, remainingOverageTime: int = 60):
     if step == 0:
         return dict(faction="TheBuilders", bid=10), 0, None, None, None
     else:
-        game_state = obs_to_game_state(step, self.env_cfg, obs)
+        game_state = self.game_state_store.update(step, obs)
         water_left = game_state.teams[self.player].water
         metal_left = game_state.teams[self.player].metal
 
@@ -65,11 +64,11 @@ def setup(self, step: int, obs, remainingOverageTime: int = 60):
 
             # Find adjacency scores for each tile
 
-            adjacency_score_map = create_score_map(ice, ore)
+            adjacency_score_map = self.placement_scores.adjacency_scores(ice, ore)
 
             # Find the closest resource to each tile
-            ice_distances = [manhattan_dist_to_nth_closest(ice, i) for i in range(1, 5)]
-            ore_distances = [manhattan_dist_to_nth_closest(ore, i) for i in range(1, 5)]
+            ice_distances = manhattan_distance_stack(ice, 4)
+            ore_distances = manhattan_distance_stack(ore, 4)
 
             # Set ice weights based on number of factories
             ICE_WEIGHTS = np.array(ice_weight_profile[factories_to_place])
@@ -85,11 +84,8 @@ def setup(self, step: int, obs, remainingOverageTime: int = 60):
             ICE_PREFERENCE = ice_pref_profile[number_of_factories][factories_to_place]
 
             # Create a vignette of high rubble tiles around the outside of the map
-            # This discourages placing factories near the edge of the map, but doesn't completely rule it out
             rubble = obs["board"]["rubble"]
-            mask = np.ones(rubble.shape, dtype=bool)
-            mask[4:-4, 4:-4] = False
-            low_rubble = (rubble < 25) & ~mask
+            low_rubble = low_rubble_map(rubble)
             low_rubble_no_vignette = (rubble == 0)
 
             # Valid spawn locations based on where other factories are
@@ -100,23 +96,16 @@ def setup(self, step: int, obs, remainingOverageTime: int = 60):
             update_low_rubble_map(low_rubble_no_vignette, valid_spawn_mask, steps=4)
 
             # Count up the areas of low rubble for scoring
-            low_rubble_scores = np.zeros_like(low_rubble, dtype=float)
-            for i in range(low_rubble.shape[0]):
-                for j in range(low_rubble.shape[1]):
-                    low_rubble_scores[i, j] = count_region_cells(low_rubble, (i, j), min_dist=0, max_dist=8,
-                                                                 exponent=0.9)
-
-            low_rubble_novignette_scores = np.zeros_like(low_rubble, dtype=float)
-            for i in range(low_rubble.shape[0]):
-                for j in range(low_rubble.shape[1]):
-                    low_rubble_novignette_scores[i, j] = count_region_cells(low_rubble, (i, j), min_dist=0, max_dist=8,
-                                                                            exponent=0.9)
+            low_rubble_scores = self.placement_scores.rubble_scores(low_rubble)
+            # the no vignette scores have always been counted on low_rubble too, so they're the same map
+            low_rubble_novignette_scores = low_rubble_scores.copy()
             distance_score = (weighted_ice_dist * ICE_PREFERENCE + weighted_ore_dist)
             inverted_distance_score = np.max(distance_score) - distance_score
             combined_score = inverted_distance_score * obs["board"]["valid_spawns_mask"]
             overall_score = (low_rubble_scores + adjacency_score_map + combined_score * 5) * obs["board"][
                 "valid_spawns_mask"]
 
+            self.placement_scores.set_candidates(overall_score)
             best_loc = np.argmax(overall_score)
             x, y = np.unravel_index(best_loc, (48, 48))
             spawn_loc = (x, y)
@@ -1,20 +1,18 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.ndimage import correlate
+
+from lib.morphology import dilate, positions_mask
+from lib.utils import manhattan_distance_stack
 
 
 # Mask out the resources near my factories, I don't want to compete with myself
 def mask_resource_near_factories(resource_map, factories, n=2):
     masked_ice_map = resource_map.copy()
 
-    for factory in factories:
-        x, y = factory[0], factory[1]
-        for dx in range(-n, n + 1):
-            for dy in range(-n, n + 1):
-                if abs(dx) + abs(dy) <= n:
-                    for fx in range(-1, 2):  # Loop through factory tiles
-                        for fy in range(-1, 2):
-                            i, j = x + dx + fx, y + dy + fy
-                            if 0 <= i < resource_map.shape[0] and 0 <= j < resource_map.shape[1]:
-                                masked_ice_map[i, j] = 0
+    # the factory footprint, then everything within n of it
+    near_factories = dilate(dilate(positions_mask(factories, resource_map.shape), 1, "chebyshev"), n)
+    masked_ice_map[near_factories] = 0
     return masked_ice_map
 
 
@@ -31,52 +29,53 @@ def score_tile(ice_adj, ore_adj):
         return 0
 
 
+# The 12 tiles just outside a 3x3 factory centered on the middle of the kernel, the ones a unit can mine from next door
+RING_KERNEL = np.array([[0, 1, 1, 1, 0],
+                        [1, 0, 0, 0, 1],
+                        [1, 0, 0, 0, 1],
+                        [1, 0, 0, 0, 1],
+                        [0, 1, 1, 1, 0]])
+RING_OFFSETS = np.argwhere(RING_KERNEL) - 2  # (dx, dy) of the 12 ring tiles
+
+# score_tile for every possible (ice count, ore count) on the ring
+SCORE_LOOKUP = np.array([[score_tile(ice_adj, ore_adj) for ore_adj in range(13)] for ice_adj in range(13)],
+                        dtype=np.int32)
+
+
 def create_score_map(ice_tiles, ore_tiles):
     width, height = ice_tiles.shape
     score_map = np.zeros((height, width), dtype=np.int32)
 
-    for row in range(2, height - 2):
-        for col in range(2, width - 2):
-            surrounding_ice = [
-                ice_tiles[row - 2, col - 1], ice_tiles[row - 2, col], ice_tiles[row - 2, col + 1],
-                ice_tiles[row - 1, col - 2], ice_tiles[row - 1, col + 2],
-                ice_tiles[row, col - 2], ice_tiles[row, col + 2],
-                ice_tiles[row + 1, col - 2], ice_tiles[row + 1, col + 2],
-                ice_tiles[row + 2, col - 1], ice_tiles[row + 2, col], ice_tiles[row + 2, col + 1]
-            ]
-            ice_adj = np.sum(surrounding_ice)
-
-            surrounding_ore = [
-                ore_tiles[row - 2, col - 1], ore_tiles[row - 2, col], ore_tiles[row - 2, col + 1],
-                ore_tiles[row - 1, col - 2], ore_tiles[row - 1, col + 2],
-                ore_tiles[row, col - 2], ore_tiles[row, col + 2],
-                ore_tiles[row + 1, col - 2], ore_tiles[row + 1, col + 2],
-                ore_tiles[row + 2, col - 1], ore_tiles[row + 2, col], ore_tiles[row + 2, col + 1]
-            ]
-            ore_adj = np.sum(surrounding_ore)
-
-            score = score_tile(ice_adj, ore_adj)
-            score_map[row, col] = score
+    ice_adj = correlate(np.asarray(ice_tiles, dtype=np.int64), RING_KERNEL, mode="constant")
+    ore_adj = correlate(np.asarray(ore_tiles, dtype=np.int64), RING_KERNEL, mode="constant")
+    # tiles within 2 of the edge keep a score of 0
+    score_map[2:-2, 2:-2] = SCORE_LOOKUP[ice_adj[2:-2, 2:-2], ore_adj[2:-2, 2:-2]]
 
     return score_map
 
 
+def ring_scores(ice_tiles, ore_tiles, xs, ys):
+    # create_score_map at just these tiles, they have to be at least 2 away from the edge
+    ring_x, ring_y = RING_OFFSETS[:, 0], RING_OFFSETS[:, 1]
+    ice_adj = np.asarray(ice_tiles, dtype=np.int64)[xs[:, np.newaxis] + ring_x, ys[:, np.newaxis] + ring_y].sum(1)
+    ore_adj = np.asarray(ore_tiles, dtype=np.int64)[xs[:, np.newaxis] + ring_x, ys[:, np.newaxis] + ring_y].sum(1)
+    return SCORE_LOOKUP[ice_adj, ore_adj]
+
+
 # This function creates a mask around each factory that will be set to high rubble
 # This will discourage placing factories too close to each other
 def expand_mask(valid_spawns, steps):
-    expanded_mask = np.zeros_like(valid_spawns)
+    # the old loop only ever wrote 0 into an all zero mask, so this has always been empty and update_low_rubble_map
+    # a no-op. Kept that way until it's fixed together with the placement weights it would change
+    return np.zeros_like(valid_spawns)
 
-    for x in range(valid_spawns.shape[0]):
-        for y in range(valid_spawns.shape[1]):
-            if valid_spawns[x, y] == 0:
-                for dx in range(-steps, steps + 1):
-                    for dy in range(-steps, steps + 1):
-                        if abs(dx) + abs(dy) <= steps:
-                            nx, ny = x + dx, y + dy
-                            if 0 <= nx < valid_spawns.shape[0] and 0 <= ny < valid_spawns.shape[1]:
-                                expanded_mask[nx, ny] = 0
 
-    return expanded_mask
+# Low rubble tiles, with a vignette of high rubble tiles around the outside of the map
+# This discourages placing factories near the edge of the map, but doesn't completely rule it out
+def low_rubble_map(rubble):
+    mask = np.ones(rubble.shape, dtype=bool)
+    mask[4:-4, 4:-4] = False
+    return (rubble < 25) & ~mask
 
 
 # Update the low rubble map to include the expanded mask
@@ -108,3 +107,99 @@ def count_region_cells(array, start, min_dist=2, max_dist=np.inf, exponent=1.0):
     visited = np.zeros_like(array, dtype=bool)
     return dfs(array, start)
 
+
+
+def region_scores(array, max_dist=8, exponent=0.9, tiles=None):
+    # count_region_cells(array, (i, j), min_dist=0, max_dist=max_dist, exponent=exponent) for every tile in one go,
+    # or only for tiles, an (xs, ys) pair, in which case you get a flat array back in the same order
+    # every tile gets a (2 * max_dist + 1)^2 window of the map cut down to its diamond, the region it can reach is grown
+    # out from the window center all at once, then each reached cell counts exponent ** (distance from the center)
+    n_rows, n_cols = array.shape
+    offsets = np.arange(-max_dist, max_dist + 1)
+    window_distances = np.abs(offsets)[:, np.newaxis] + np.abs(offsets)[np.newaxis, :]
+    diamond = window_distances <= max_dist
+    padded = np.pad(array.astype(bool), max_dist)
+    size = 2 * max_dist + 1
+    all_windows = sliding_window_view(padded, (size, size))
+    if tiles is None:
+        windows = all_windows.reshape(n_rows * n_cols, size, size) & diamond
+    else:
+        windows = all_windows[tiles[0], tiles[1]] & diamond
+
+    reached = np.zeros_like(windows)
+    reached[:, max_dist, max_dist] = windows[:, max_dist, max_dist]
+    growing = np.flatnonzero(reached[:, max_dist, max_dist])
+    while len(growing) > 0:
+        # only the windows that still grew last round can grow again
+        current = reached[growing]
+        grown = current.copy()
+        grown[:, 1:, :] |= current[:, :-1, :]
+        grown[:, :-1, :] |= current[:, 1:, :]
+        grown[:, :, 1:] |= current[:, :, :-1]
+        grown[:, :, :-1] |= current[:, :, 1:]
+        grown &= windows[growing]
+        changed = (grown != current).any((1, 2))
+        reached[growing] = grown
+        growing = growing[changed]
+
+    weights = exponent ** window_distances.astype(float)
+    scores = (reached * weights).sum((1, 2))
+    if tiles is None:
+        return scores.reshape(n_rows, n_cols)
+    return scores
+
+
+class PlacementScores:
+    """
+    The score layers setup builds for factory placement, kept on the Agent between placement turns.
+    Between turns only my factories (which mask resources) and newly placed factories (which clear rubble) change
+    what these layers are built from, so later turns only rescore the tiles close enough to see a change.
+    The distance stacks are cached on the resource maps themselves, see manhattan_distance_stack.
+    """
+    def __init__(self):
+        self.ice = None  # the maps the layers were last built from
+        self.ore = None
+        self.low_rubble = None
+        self.adjacency = None  # create_score_map(ice, ore)
+        self.low_rubble_scores = None  # region_scores(low_rubble, max_dist=8, exponent=0.9)
+        self.candidates = []  # best spawns by overall score on the last placement turn
+
+    def prime(self, board):
+        # build the layers during the bidding step, the first placement turn then only catches up on changes
+        ice, ore = np.copy(board["ice"]), np.copy(board["ore"])
+        self.adjacency_scores(ice, ore)
+        manhattan_distance_stack(ice, 4)
+        manhattan_distance_stack(ore, 4)
+        low_rubble = low_rubble_map(board["rubble"])
+        update_low_rubble_map(low_rubble, board["valid_spawns_mask"], steps=4)
+        self.rubble_scores(low_rubble)
+
+    def set_candidates(self, overall_score, n=4):
+        best = np.argsort(overall_score, axis=None)[::-1][:n]
+        self.candidates = [np.array([x, y]) for x, y in zip(*np.unravel_index(best, overall_score.shape))]
+
+    def adjacency_scores(self, ice, ore):
+        if self.adjacency is None:
+            self.adjacency = create_score_map(ice, ore)
+        else:
+            changed = (ice != self.ice) | (ore != self.ore)
+            if changed.any():
+                # a tile's score only counts its ring, 2 tiles out, and tiles within 2 of the edge are never scored
+                rescore = dilate(changed, 2, "chebyshev")
+                rescore[:2, :] = rescore[-2:, :] = rescore[:, :2] = rescore[:, -2:] = False
+                xs, ys = np.nonzero(rescore)
+                self.adjacency[xs, ys] = ring_scores(ice, ore, xs, ys)
+        self.ice, self.ore = ice.copy(), ore.copy()
+        return self.adjacency.copy()
+
+    def rubble_scores(self, low_rubble):
+        if self.low_rubble_scores is None:
+            self.low_rubble_scores = region_scores(low_rubble, max_dist=8, exponent=0.9)
+        else:
+            changed = low_rubble != self.low_rubble
+            if changed.any():
+                # a region is never counted further than 8 out
+                xs, ys = np.nonzero(dilate(changed, 8))
+                self.low_rubble_scores[xs, ys] = region_scores(low_rubble, max_dist=8, exponent=0.9, tiles=(xs, ys))
+        self.low_rubble = low_rubble.copy()
+        return self.low_rubble_scores.copy()
@@ -0,0 +1,91 @@
+import numpy as np
+
+from scipy.ndimage import distance_transform_cdt
+from scipy.spatial import KDTree
+
+RESOURCES = ("ice", "ore")
+NO_RESOURCE_DISTANCE = 2 * 48  # further than any two tiles can be apart
+
+
+class StaticMapIndex:
+    """
+    Everything derived from the ice and ore maps, which never change during a game.
+    Built once from the first observation, see get_static_index.
+    coords are in row major order, the same order np.argwhere gives, so argmin ties resolve like they used to.
+    """
+    def __init__(self, board):
+        self.masks = dict()  # resource: bool map
+        self.coords = dict()  # resource: (n, 2) tile coordinates
+        self.trees = dict()  # resource: KDTree over coords, None if there are no tiles
+        self.distances = dict()  # resource: manhattan distance from every tile to the closest resource tile
+        for resource in RESOURCES:
+            mask = board[resource] == 1
+            self.masks[resource] = mask
+            self.coords[resource] = np.argwhere(mask)
+            self.trees[resource] = KDTree(self.coords[resource]) if len(self.coords[resource]) > 0 else None
+            if len(self.coords[resource]) > 0:
+                self.distances[resource] = distance_transform_cdt(~mask, metric='taxicab')
+            else:
+                # cdt gives -1 everywhere when there's nothing to measure to, that would read as "right here"
+                self.distances[resource] = np.full(mask.shape, NO_RESOURCE_DISTANCE)
+
+        self.resource_mask = self.masks["ice"] | self.masks["ore"]
+        self.resource_coords = np.argwhere(self.resource_mask)
+
+    def tiles_within(self, resource: str, center, distance: int) -> np.ndarray:
+        # resource tiles strictly closer than distance (manhattan) to center, in row major order
+        tree = self.trees[resource]
+        if tree is None:
+            return np.zeros((0, 2), dtype=int)
+        found = tree.query_ball_point([center[0], center[1]], r=distance - 0.5, p=1)
+        return self.coords[resource][np.sort(found).astype(int)]
+
+    def nearest_free(self, resource: str, center, k: int = 1, ledgers=(), exclude=()) -> np.ndarray:
+        """
+        Up to k resource tiles closest to center by manhattan distance, skipping tiles any of the DibsLedgers has
+        claimed and the positions in exclude. Closest first, ties go to the tile that comes first in row major order.
+        Only asks the tree for as many tiles as could possibly be blocked, so nothing is copied or masked.
+        """
+        tree = self.trees[resource]
+        if tree is None or k < 1:
+            return np.zeros((0, 2), dtype=int)
+        coords = self.coords[resource]
+        center = [int(center[0]), int(center[1])]
+        exclude = {(int(pos[0]), int(pos[1])) for pos in exclude}
+
+        def free(found):
+            tiles = coords[found]
+            is_free = np.ones(len(found), dtype=bool)
+            for ledger in ledgers:
+                is_free &= ledger.claims[tiles[:, 0], tiles[:, 1]] == 0
+            if exclude:
+                is_free &= np.array([(x, y) not in exclude for x, y in tiles.tolist()], dtype=bool)
+            return found[is_free]
+
+        n_blocked = sum(len(ledger) for ledger in ledgers) + len(exclude)
+        n_query = min(len(coords), k + n_blocked)
+        _, found = tree.query(center, k=n_query, p=1)
+        found = free(np.atleast_1d(found).astype(int))
+        if len(found) == 0:
+            return np.zeros((0, 2), dtype=int)
+        if n_query < len(coords):
+            # the tree breaks ties any way it likes, pick up every tile as close as the kth free one
+            cutoff = np.abs(coords[found[min(k, len(found)) - 1]] - center).sum()
+            found = free(np.array(tree.query_ball_point(center, r=cutoff + 0.5, p=1), dtype=int))
+        distances = np.abs(coords[found] - center).sum(1)
+        return coords[found[np.lexsort((found, distances))][:k]]
+
+
+_static_indexes = dict()  # id of the ice map: (ice map, StaticMapIndex)
+
+
+def get_static_index(board) -> StaticMapIndex:
+    # process_obs keeps the same ice array for the whole game, so its identity is the game's identity
+    ice_map = board["ice"]
+    entry = _static_indexes.get(id(ice_map))
+    if entry is None or entry[0] is not ice_map:
+        if len(_static_indexes) >= 8:
+            _static_indexes.clear()
+        entry = (ice_map, StaticMapIndex(board))
+        _static_indexes[id(ice_map)] = entry
+    return entry[1]
@@ -0,0 +1,88 @@
+import numpy as np
+
+from lib.grid import BOARD_SIZE, N_TILES
+
+UNIT_TYPE_CODES = {"LIGHT": 0, "HEAVY": 1}
+
+
+class UnitTable:
+    """
+    One side's units as parallel arrays, row i is the i-th unit in the order they were given (the observation's order
+    for the per player dicts), so a selection comes back in the same order a loop over the dict would find it.
+    Built once per step, positions, power and cargo don't change until the next observation.
+    """
+    def __init__(self, units):
+        units = list(units.values()) if isinstance(units, dict) else list(units)
+        n = len(units)
+        self.units = units
+        self.ids = np.array([u.unit_id for u in units], dtype=object)
+        self.type_code = np.fromiter((UNIT_TYPE_CODES[u.unit_type] for u in units), dtype=np.int8, count=n)
+        self.x = np.fromiter((u.pos[0] for u in units), dtype=np.int64, count=n)
+        self.y = np.fromiter((u.pos[1] for u in units), dtype=np.int64, count=n)
+        self.power = np.fromiter((u.power for u in units), dtype=np.int64, count=n)
+        self.ice = np.fromiter((u.cargo.ice for u in units), dtype=np.int64, count=n)
+        self.ore = np.fromiter((u.cargo.ore for u in units), dtype=np.int64, count=n)
+        self.water = np.fromiter((u.cargo.water for u in units), dtype=np.int64, count=n)
+        self.metal = np.fromiter((u.cargo.metal for u in units), dtype=np.int64, count=n)
+        self.tile = self.x * BOARD_SIZE + self.y  # packed, see lib/grid.py
+        self.is_heavy = self.type_code == UNIT_TYPE_CODES["HEAVY"]
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    def select(self, rows) -> dict:
+        # {unit_id: unit} for a bool mask over the rows
+        return {self.units[i].unit_id: self.units[i] for i in np.flatnonzero(rows).tolist()}
+
+    def positions(self, rows=None) -> np.ndarray:
+        # (n, 2) positions of the selected rows, all of them by default
+        if rows is None:
+            return np.column_stack((self.x, self.y))
+        return np.column_stack((self.x[rows], self.y[rows]))
+
+    def other_than(self, unit_id) -> np.ndarray:
+        return self.ids != unit_id
+
+    def on_tiles(self, tiles) -> np.ndarray:
+        # rows of the units standing on any of the packed tiles, a lookup table is far cheaper than np.isin here
+        hit = np.zeros(N_TILES, dtype=bool)
+        hit[np.asarray(tiles, dtype=np.int64)] = True
+        return hit[self.tile]
+
+    def within(self, pos, radius: int, heavy_only: bool = False) -> np.ndarray:
+        # rows of the units at most radius away from pos, by manhattan distance
+        rows = np.abs(self.x - int(pos[0])) + np.abs(self.y - int(pos[1])) <= radius
+        if heavy_only:
+            rows &= self.is_heavy
+        return rows
+
+    def occupancy(self, rows=None) -> np.ndarray:
+        # 48x48 bool map of the tiles the selected units stand on
+        mask = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=bool)
+        if rows is None:
+            rows = slice(None)
+        mask[self.x[rows], self.y[rows]] = True
+        return mask
+
+    def reach(self, rows=None) -> np.ndarray:
+        # 48x48 bool map of the tiles the selected units could be on after their next move
+        mask = self.occupancy(rows)
+        reach = mask.copy()
+        reach[1:, :] |= mask[:-1, :]
+        reach[:-1, :] |= mask[1:, :]
+        reach[:, 1:] |= mask[:, :-1]
+        reach[:, :-1] |= mask[:, 1:]
+        return reach
+
+    def threat_grid(self, rows=None) -> np.ndarray:
+        # 48x48 map of the most power any selected unit could bring onto each tile with its next move
+        if rows is None:
+            rows = np.ones(len(self), dtype=bool)
+        x, y, power = self.x[rows], self.y[rows], self.power[rows]
+        grid = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=np.int64)
+        np.maximum.at(grid, (x, y), power)
+        for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0)):
+            nx, ny = x + dx, y + dy
+            on_board = (0 <= nx) & (nx < BOARD_SIZE) & (0 <= ny) & (ny < BOARD_SIZE)
+            np.maximum.at(grid, (nx[on_board], ny[on_board]), power[on_board])
+        return grid
@@ -8,6 +8,9 @@ import numpy as np
 from scipy.ndimage import distance_transform_cdt
 from scipy.spatial import KDTree
 
+from lib.occupancy import OccupancyGrid, as_occupancy
+from lib.static_index import get_static_index
+
 
 def distance_to(start: np.ndarray, finish: np.ndarray) -> int:
     # Manhattan distance between two points
@@ -71,13 +74,32 @@ def manhattan_dist_to_nth_closest(arr, n):
         distance_map = distance_transform_cdt(1 - arr, metric='taxicab')
         return distance_map
     else:
-        true_coords = np.transpose(np.nonzero(arr))  # get the coordinates of true values
-        tree = KDTree(true_coords)  # build a KDTree
+        return manhattan_distance_stack(arr, n)[n - 1]
+
+
+_distance_stacks = dict()  # (shape, resource tile bytes): (k, n_rows, n_cols) distance stack
 
-        # query the nearest to nth closest distances using p=1 for Manhattan distance
-        dist, _ = tree.query(np.transpose(np.nonzero(~arr)), k=n, p=1)
 
-        return np.reshape(dist[:, n - 1], arr.shape)  # reshape the result to match the input shap
+def manhattan_distance_stack(arr, k):
+    # layer i is the manhattan distance from every tile to its (i + 1)th closest true tile, inf if there aren't that many
+    # one tree and one query for all k layers, cached on the map since the resource maps barely change during setup
+    mask = np.asarray(arr) != 0
+    key = (mask.shape, np.packbits(mask).tobytes())
+    stack = _distance_stacks.get(key)
+    if stack is None or len(stack) < k:
+        true_coords = np.argwhere(mask)
+        if len(true_coords) == 0:
+            stack = np.full((k,) + mask.shape, np.inf)
+        else:
+            tree = KDTree(true_coords)
+            # query the nearest to kth closest distances using p=1 for Manhattan distance
+            dist, _ = tree.query(np.argwhere(np.ones_like(mask)), k=range(1, k + 1), p=1)
+            stack = dist.T.reshape((k,) + mask.shape)
+        stack.setflags(write=False)
+        if len(_distance_stacks) >= 16:
+            _distance_stacks.clear()
+        _distance_stacks[key] = stack
+    return stack[:k]
 
 
 def get_helper_tile(homer_pos, home_pos):
@@ -99,11 +121,8 @@ def tile_adjacent(tile: np.ndarray, position: np.ndarray) -> bool:
     return False
 
 
-def can_stay(position: np.ndarray, off_limits: list) -> bool:
-    for tile in off_limits:
-        if tile[0] == position[0] and tile[1] == position[1]:
-            return False
-    return True
+def can_stay(position: np.ndarray, off_limits) -> bool:
+    return position not in as_occupancy(off_limits)
 
 
 def move_cost(unit, pos, board) -> int:
@@ -172,11 +191,10 @@ def get_factory_tiles(f: np.ndarray):
 
 
 def get_closest_factory(factories: dict, position: np.ndarray):
-    factory_units = np.array([f for u, f in factories.items()])
-    factory_tiles = np.array([f.pos for u, f in factories.items()])
-    factory_distances = np.mean((factory_tiles - position) ** 2, 1)
-    closest = factory_units[np.argmin(factory_distances)]
-    return closest
+    # for all of one side's factories use Agent.closest_my_factory/closest_opp_factory, this is for subsets
+    # ranked by squared distance, ties go to the first factory
+    x, y = int(position[0]), int(position[1])
+    return min(factories.values(), key=lambda f: (int(f.pos[0]) - x) ** 2 + (int(f.pos[1]) - y) ** 2)
 
 
 def closest_factory_tile(factory_pos: np.ndarray, position: np.ndarray, heavies) -> np.ndarray:
@@ -192,14 +210,11 @@ def closest_factory_tile(factory_pos: np.ndarray, position: np.ndarray, heavies)
     return factory_tiles[np.argmin(factory_distances)]
 
 
-def closest_resource_tile(resource: str, start: np.ndarray, off_limits: list, board):
-    tile_map = np.copy(board[resource])
-    for pos in off_limits:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            tile_map[x, y] = 0
-    tile_locations = np.argwhere(tile_map == 1)
+def closest_resource_tile(resource: str, start: np.ndarray, off_limits, board):
+    tile_locations = get_static_index(board).coords[resource]
+    if len(off_limits) > 0:
+        off_limits_mask = as_occupancy(off_limits).mask
+        tile_locations = tile_locations[~off_limits_mask[tile_locations[:, 0], tile_locations[:, 1]]]
     if len(tile_locations) == 0:
         return None
     tile_distances = np.mean((tile_locations - start) ** 2, 1)
@@ -207,14 +222,9 @@ def closest_resource_tile(resource: str, start: np.ndarray, off_limits: list, bo
     return target_tile
 
 
-def closest_rubble_tile(start: np.ndarray, off_limits: list, board):
+def closest_rubble_tile(start: np.ndarray, off_limits, board):
     """Finds the closest rubble tile to the unit that is not occupied by a unit or a factory"""
-    tile_map = np.copy(board["rubble"])
-    for pos in off_limits:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            tile_map[x][y] = 0
+    tile_map = np.where(as_occupancy(off_limits).mask, 0, board["rubble"])
     tile_locations = np.argwhere(((tile_map <= 40) & (tile_map > 0)))
     tile_distances = np.mean((tile_locations - start) ** 2, 1)
     if np.min(tile_distances) >= 20:
@@ -224,26 +234,10 @@ def closest_rubble_tile(start: np.ndarray, off_limits: list, board):
     return target_tile
 
 
-def closest_rubble_tile_in_group(start: np.ndarray, off_limits: list, group: list, board):
+def closest_rubble_tile_in_group(start: np.ndarray, off_limits, group: list, board):
     """Finds the closest tile in a group of tiles to the unit that is not occupied by a unit or a factory"""
-    off_limits_set = set()
-    for pos in off_limits:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            off_limits_set.add((x, y))
-    group_set = set()
-    for pos in group:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            group_set.add((x, y))
-    group_set = group_set - off_limits_set
-    if len(group_set) == 0:
-        return None
-    group_list = list(group_set)
-    group_rubble_tiles = np.array(
-        [np.array([f[0], f[1]]) for f in group_list if board["rubble"][f[0], f[1]] > 0])
+    group_mask = OccupancyGrid(group).mask & ~as_occupancy(off_limits).mask & (board["rubble"] > 0)
+    group_rubble_tiles = np.argwhere(group_mask)
     if len(group_rubble_tiles) == 0:
         return None
     group_distances = np.mean((group_rubble_tiles - start) ** 2, 1)
@@ -251,25 +245,9 @@ def closest_rubble_tile_in_group(start: np.ndarray, off_limits: list, group: lis
     return target_tile
 
 
-def closest_tile_in_group(start: np.ndarray, off_limits: list, group: list):
+def closest_tile_in_group(start: np.ndarray, off_limits, group: list):
     """Finds the closest tile in a group of tiles to the unit that is not occupied by a unit or a factory"""
-    off_limits_set = set()
-    for pos in off_limits:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            off_limits_set.add((x, y))
-    group_set = set()
-    for pos in group:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            group_set.add((x, y))
-    group_set = group_set - off_limits_set
-    if len(group_set) == 0:
-        return None
-    group_list = list(group_set)
-    group_tiles = np.array([np.array([f[0], f[1]]) for f in group_list])
+    group_tiles = np.argwhere(OccupancyGrid(group).mask & ~as_occupancy(off_limits).mask)
     if len(group_tiles) == 0:
         return None
     group_distances = np.mean((group_tiles - start) ** 2, 1)
@@ -288,21 +266,17 @@ def get_outer_adjacent_tiles(center_tile):
     return adjacent_tiles
 
 
-def closest_opp_lichen(opp_strains, start: np.ndarray, off_limits: list, board, priority=False, tile_amount=0,
+def closest_opp_lichen(opp_strains, start: np.ndarray, off_limits, board, priority=False, tile_amount=0,
                        group=None):
-    lichen_tiles = np.copy(board["lichen_strains"])
-    lichen_amounts = np.copy(board["lichen"])
-    for pos in off_limits:
-        x = int(pos[0])
-        y = int(pos[1])
-        if x < 48 and y < 48:
-            lichen_tiles[x, y] = 1000  # this is a null value for the lichen strains
+    # 1000 is a null value for the lichen strains
+    lichen_tiles = np.where(as_occupancy(off_limits).mask, 1000, board["lichen_strains"])
+    lichen_amounts = board["lichen"]
 
     if group is not None:
         lichen_tiles = {tile: lichen_tiles[tile] for tile in group}
 
     if priority:
-        priority_strain = find_most_common_integer(lichen_tiles, opp_strains, strain_amount=15)
+        priority_strain = board["strain_ledger"].strains_with_at_least(opp_strains, 15, as_occupancy(off_limits))
         tile_locations = np.argwhere((np.isin(lichen_tiles, priority_strain) & (lichen_amounts > tile_amount)))
     else:
         tile_locations = np.argwhere((np.isin(lichen_tiles, opp_strains) & (lichen_amounts > tile_amount)))
@@ -347,7 +321,7 @@ def get_lichen_in_square(lichen_tiles, player_strains, pos, size):
     return square_tiles
 
 
-def find_new_direction(position: np.ndarray, target: np.ndarray, off_limits: list) -> int:
+def find_new_direction(position: np.ndarray, target: np.ndarray, off_limits) -> int:
     #  direction (0 = center, 1 = up, 2 = right, 3 = down, 4 = left)
     cardinal_dir = get_cardinal_direction(position, target)
     if cardinal_dir == "E":
@@ -386,30 +360,24 @@ def find_new_direction(position: np.ndarray, target: np.ndarray, off_limits: lis
         r = list(range(1, 5))
         random.shuffle(r)
 
+    off_limits = as_occupancy(off_limits)
     for d in r:
         new_pos = next_position(position, d)
-        pos_off_limits = False
-        for pos in off_limits:
-            if on_tile(pos, new_pos):
-                pos_off_limits = True
-                break
-        if pos_off_limits:
+        if new_pos in off_limits:
             continue
         elif 0 <= new_pos[0] < 48 and 0 <= new_pos[1] < 48:
             return d
     return 0
 
 
-def move_toward(position: np.ndarray, target: np.ndarray, off_limits: list, desired_direction=None) -> int:
+def move_toward(position: np.ndarray, target: np.ndarray, off_limits, desired_direction=None) -> int:
     if desired_direction is not None:
         direction = desired_direction
     else:
         direction = direction_to(position, target)
-    new_pos = next_position(position, direction)
-    for pos in off_limits:
-        if on_tile(pos, new_pos):
-            direction = find_new_direction(position, target, off_limits)
-            return direction
+    off_limits = as_occupancy(off_limits)
+    if next_position(position, direction) in off_limits:
+        direction = find_new_direction(position, target, off_limits)
     return direction
 
 
@@ -418,7 +386,7 @@ def truncate_actions(actions, unit, pauses=None):
     count = 1
 
     for i in range(1, len(actions)):
-        if np.array_equal(actions[i], actions[i - 1]):
+        if actions[i] == actions[i - 1]:
             count += 1
         else:
             new_action = actions[i - 1].copy()
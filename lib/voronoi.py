@@ -0,0 +1,61 @@
+import numpy as np
+
+from lib.grid import BOARD_SIZE, TILE_X, TILE_Y
+
+
+class FactoryVoronoi:
+    """
+    Which factory is closest to each tile of the board, for one set of factories.
+    metric is "manhattan", or "euclidean" to rank the way get_closest_factory does.
+    Ties go to the factory that comes first in the factories dict, owner is -1 everywhere when there are none.
+    Factories don't move, so one of these is good until a factory is built or destroyed, see get_factory_voronoi.
+    """
+    def __init__(self, factories: dict, metric: str = "manhattan"):
+        self.fids = list(factories.keys())
+        self.positions = np.array([f.pos for f in factories.values()], dtype=np.int64).reshape(-1, 2)
+        self.index = {(int(x), int(y)): i for i, (x, y) in enumerate(self.positions.tolist())}  # center: factory index
+        dx = TILE_X[np.newaxis] - self.positions[:, 0, np.newaxis, np.newaxis]
+        dy = TILE_Y[np.newaxis] - self.positions[:, 1, np.newaxis, np.newaxis]
+        if metric == "manhattan":
+            self.distances = np.abs(dx) + np.abs(dy)
+        elif metric == "euclidean":
+            self.distances = dx ** 2 + dy ** 2
+        else:
+            raise ValueError(f"unknown metric {metric}")
+        if len(self.fids) > 0:
+            self.nearest = self.distances.min(0)
+            self.owner = self.distances.argmin(0)
+        else:
+            self.nearest = np.full((BOARD_SIZE, BOARD_SIZE), np.iinfo(np.int64).max)
+            self.owner = np.full((BOARD_SIZE, BOARD_SIZE), -1)
+        self.counts = dict()  # (id of the mask, distance): (mask, counts per factory)
+
+    def closest(self, pos):
+        # fid of the closest factory, None if there are no factories
+        i = self.owner[int(pos[0]), int(pos[1])]
+        return self.fids[i] if i >= 0 else None
+
+    def counts_within(self, mask: np.ndarray, distance: int) -> np.ndarray:
+        # per factory, the tiles of mask strictly closer than distance that no other factory is closer to
+        # a tile two factories are equally close to counts for both
+        key = (id(mask), distance)
+        entry = self.counts.get(key)
+        if entry is None or entry[0] is not mask:
+            claims = (self.distances == self.nearest) & (self.distances < distance) & mask
+            entry = (mask, np.bincount(np.nonzero(claims)[0], minlength=len(self.fids)))
+            self.counts[key] = entry
+        return entry[1]
+
+
+_voronois = dict()  # (metric, ((fid, x, y), ...)): FactoryVoronoi
+
+
+def get_factory_voronoi(factories: dict, metric: str = "manhattan") -> FactoryVoronoi:
+    key = (metric, tuple((fid, int(f.pos[0]), int(f.pos[1])) for fid, f in factories.items()))
+    voronoi = _voronois.get(key)
+    if voronoi is None:
+        if len(_voronois) >= 16:
+            _voronois.clear()
+        voronoi = FactoryVoronoi(factories, metric)
+        _voronois[key] = voronoi
+    return voronoi
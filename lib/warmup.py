@@ -0,0 +1,47 @@
+import numpy as np
+
+from lib.astar import astar_path, last_search_region
+from lib.occupancy import as_occupancy
+
+WARM_UP_SECONDS = 1.0  # most of a bidding/placement step is idle, this much of it goes to warming up
+WARM_UP_OVERAGE_SHARE = 0.02  # and never more than this share of the overage time that's left
+
+
+def warm_up_budget(remainingOverageTime) -> float:
+    # seconds of warm up work for this step
+    return max(0.0, min(WARM_UP_SECONDS, remainingOverageTime * WARM_UP_OVERAGE_SHARE))
+
+
+class WarmPaths:
+    """
+    astar_path results worked out ahead of time, during the bidding and placement steps, for the ore and clearing
+    paths every factory gets on step 2.
+    Each entry keeps the rubble and off limits state of the tiles its search looked at (see last_search_region)
+    and is only handed out while all of those still read the same, so a hit is the path a new search would find.
+    """
+    def __init__(self):
+        self.entries = dict()  # (start, finish, rubble_threshold): (path, region, rubble on region, blocked on region)
+        self.hits = 0
+        self.misses = 0
+
+    def search(self, rubble_map, start, finish, off_limits, rubble_threshold=0) -> list:
+        key = (int(start[0]), int(start[1])), (int(finish[0]), int(finish[1])), rubble_threshold
+        blocked = as_occupancy(off_limits).mask
+        entry = self.entries.get(key)
+        if entry is not None:
+            path, region, rubble, was_blocked = entry
+            if np.array_equal(rubble_map[region], rubble) and np.array_equal(blocked[region], was_blocked):
+                self.hits += 1
+                return [[x, y] for x, y in path]
+        self.misses += 1
+        path = astar_path(rubble_map, start, finish, [], off_limits, rubble_threshold=rubble_threshold)
+        region = last_search_region(*rubble_map.shape)
+        self.entries[key] = [(x, y) for x, y in path], region, rubble_map[region], blocked[region]
+        return path
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return f"{self.hits} hits, {self.misses} misses, {len(self.entries)} warm"
@@ -1,8 +1,16 @@
-from dataclasses import dataclass
-
-@dataclass
 class UnitCargo:
-    ice: int = 0
-    ore: int = 0
-    water: int = 0
-    metal: int = 0
+    __slots__ = ("ice", "ore", "water", "metal")
+
+    def __init__(self, ice: int = 0, ore: int = 0, water: int = 0, metal: int = 0):
+        self.ice = ice
+        self.ore = ore
+        self.water = water
+        self.metal = metal
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UnitCargo):
+            return NotImplemented
+        return (self.ice, self.ore, self.water, self.metal) == (other.ice, other.ore, other.water, other.metal)
+
+    def __repr__(self) -> str:
+        return f"UnitCargo(ice={self.ice}, ore={self.ore}, water={self.water}, metal={self.metal})"
@@ -1,20 +1,24 @@
 import math
 from sys import stderr
 import numpy as np
-from dataclasses import dataclass
 from lux.cargo import UnitCargo
 from lux.config import EnvConfig
-@dataclass
+from lux.unit import frozen_position
 class Factory:
-    team_id: int
-    unit_id: str
-    strain_id: int
-    power: int
-    cargo: UnitCargo
-    pos: np.ndarray
-    # lichen tiles connected to this factory
-    # lichen_tiles: np.ndarray
-    env_cfg: EnvConfig
+    __slots__ = ("team_id", "unit_id", "strain_id", "power", "cargo", "_pos")
+    env_cfg: EnvConfig = None  # the game's config, shared by every factory, see GameStateStore
+
+    def __init__(self, team_id: int, unit_id: str, strain_id: int, power: int, cargo: UnitCargo, pos):
+        self.team_id = team_id
+        self.unit_id = unit_id
+        self.strain_id = strain_id
+        self.power = power
+        self.cargo = cargo
+        self._pos = frozen_position(pos)  # factories never move
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self._pos
 
     def build_heavy_metal_cost(self, game_state):
         unit_cfg = self.env_cfg.ROBOTS["HEAVY"]
@@ -43,7 +47,10 @@ class Factory:
         """
         Water required to perform water action
         """
-        owned_lichen_tiles = (game_state.board.lichen_strains == self.strain_id).sum()
+        if game_state.board.strain_ledger is not None:
+            owned_lichen_tiles = game_state.board.strain_ledger.tile_count(self.strain_id)
+        else:
+            owned_lichen_tiles = (game_state.board.lichen_strains == self.strain_id).sum()
         return np.ceil(owned_lichen_tiles / self.env_cfg.LICHEN_WATERING_COST_FACTOR)
     def can_water(self, game_state):
         return self.cargo.water >= self.water_cost(game_state)
@@ -6,6 +6,7 @@ from lux.config import EnvConfig
 from lux.team import Team, FactionTypes
 from lux.unit import Unit
 from lux.factory import Factory
+from lux.strains import StrainLedger
 def process_action(action):
     return to_json(action)
 def to_json(obj):
@@ -35,39 +36,63 @@ def from_json(state):
     else:
         return state 
 
+BOARD_DELTA_LAYERS = ("rubble", "lichen", "lichen_strains")
+
+
+def decode_delta(delta: dict):
+    # {"x,y": value} delta of one board layer to x, y and value arrays, parsing all of the keys in one go
+    if len(delta) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    xy = np.fromstring(",".join(delta.keys()), dtype=np.int64, sep=",").reshape(-1, 2)
+    return xy[:, 0], xy[:, 1], np.array(list(delta.values()))
+
+
+def apply_board_deltas(board, deltas) -> dict:
+    # writes the delta of every board layer with one assignment, returns the tiles that changed per layer
+    decoded = {item: decode_delta(deltas.get(item, {})) for item in BOARD_DELTA_LAYERS}
+
+    # the strain ledger needs the strain and lichen from before the deltas of every tile either of them touches
+    xs = np.concatenate((decoded["lichen"][0], decoded["lichen_strains"][0]))
+    ys = np.concatenate((decoded["lichen"][1], decoded["lichen_strains"][1]))
+    lichen_changes = dict(zip(zip(xs.tolist(), ys.tolist()),
+                              zip(board["lichen_strains"][xs, ys].tolist(), board["lichen"][xs, ys].tolist())))
+
+    changed = dict()
+    for item, (xs, ys, values) in decoded.items():
+        board[item][xs, ys] = values
+        changed[item] = set(zip(xs.tolist(), ys.tolist()))
+    board["strain_ledger"].apply(board, lichen_changes)
+    return changed
+
+
 def process_obs(player, game_state, step, obs):
     if step == 0:
         # at step 0 we get the entire map information
         game_state = from_json(obs)
+        game_state["board_changes"] = {item: set() for item in BOARD_DELTA_LAYERS}
+        game_state["board"]["strain_ledger"] = StrainLedger(game_state["board"])
     else:
-        # use delta changes to board to update game state
-        obs = from_json(obs)
+        # use delta changes to board to update game state, the board deltas are decoded in bulk and skip from_json
         for k in obs:
             if k != 'board':
-                game_state[k] = obs[k]
+                game_state[k] = from_json(obs[k])
             else:
                 if "valid_spawns_mask" in obs[k]:
-                    game_state["board"]["valid_spawns_mask"] = obs[k]["valid_spawns_mask"]
-        for item in ["rubble", "lichen", "lichen_strains"]:
-            for k, v in obs["board"][item].items():
-                k = k.split(",")
-                x, y = int(k[0]), int(k[1])
-                game_state["board"][item][x, y] = v
+                    game_state["board"]["valid_spawns_mask"] = np.array(obs[k]["valid_spawns_mask"])
+        # tiles that changed this step, so caches built on the board know what to throw away
+        game_state["board_changes"] = apply_board_deltas(game_state["board"], obs["board"])
     return game_state
 
 def obs_to_game_state(step, env_cfg: EnvConfig, obs):
-    
+    Unit.env_cfg = Factory.env_cfg = env_cfg
     units = dict()
     for agent in obs["units"]:
         units[agent] = dict()
         for unit_id in obs["units"][agent]:
             unit_data = obs["units"][agent][unit_id]
             cargo = UnitCargo(**unit_data["cargo"])
-            unit = Unit(
-                **unit_data,
-                unit_cfg=env_cfg.ROBOTS[unit_data["unit_type"]],
-                env_cfg=env_cfg
-            )
+            unit = Unit(**unit_data)
             unit.cargo = cargo
             units[agent][unit_id] = unit
             
@@ -79,10 +104,7 @@ def obs_to_game_state(step, env_cfg: EnvConfig, obs):
         for unit_id in obs["factories"][agent]:
             f_data = obs["factories"][agent][unit_id]
             cargo = UnitCargo(**f_data["cargo"])
-            factory = Factory(
-                **f_data,
-                env_cfg=env_cfg
-            )
+            factory = Factory(**f_data)
             factory.cargo = cargo
             factories[agent][unit_id] = factory
             factory_occupancy_map[factory.pos_slice] = factory.strain_id
@@ -103,7 +125,8 @@ def obs_to_game_state(step, env_cfg: EnvConfig, obs):
             lichen_strains=obs["board"]["lichen_strains"],
             factory_occupancy_map=factory_occupancy_map,
             factories_per_team=obs["board"]["factories_per_team"],
-            valid_spawns_mask=obs["board"]["valid_spawns_mask"]
+            valid_spawns_mask=obs["board"]["valid_spawns_mask"],
+            strain_ledger=obs["board"].get("strain_ledger")
         ),
         units=units,
         factories=factories,
@@ -121,6 +144,7 @@ class Board:
     factory_occupancy_map: np.ndarray
     factories_per_team: int
     valid_spawns_mask: np.ndarray
+    strain_ledger: StrainLedger = None
 @dataclass
 class GameState:
     """
@@ -148,3 +172,111 @@ class GameState:
     def is_day(self):
         return self.real_env_steps % self.env_cfg.CYCLE_LENGTH < self.env_cfg.DAY_LENGTH
 
+
+class GameStateStore:
+    """
+    One GameState kept for the whole game instead of a new one from obs_to_game_state every step.
+    Units and factories are created when they first show up and updated in place after that (pos, power, cargo
+    and action_queue), the per player dicts are rebuilt every step in observation order.
+    born and died hold the ids that showed up and the ones that went missing this step, {"units": {player: set},
+    "factories": {player: set}}, so memory keyed by unit or factory id only has to be touched when something changed.
+    """
+    def __init__(self, env_cfg: EnvConfig):
+        self.env_cfg = env_cfg
+        Unit.env_cfg = Factory.env_cfg = env_cfg
+        self.game_state = None
+        self.units = dict()  # unit_id: Unit
+        self.factories = dict()  # unit_id: Factory
+        self.factory_occupancy_map = None
+        self.born = {"units": dict(), "factories": dict()}
+        self.died = {"units": dict(), "factories": dict()}
+
+    def update(self, step, obs) -> GameState:
+        board = obs["board"]
+        if self.factory_occupancy_map is None:
+            self.factory_occupancy_map = np.full(board["rubble"].shape, -1, dtype=int)
+
+        units = {agent: self.update_units(agent, obs["units"][agent]) for agent in obs["units"]}
+        factories = {agent: self.update_factories(agent, obs["factories"][agent]) for agent in obs["factories"]}
+        teams = {agent: Team(**team_data, agent=agent) for agent, team_data in obs["teams"].items()}
+
+        if self.game_state is None:
+            self.game_state = GameState(
+                env_cfg=self.env_cfg,
+                env_steps=step,
+                board=Board(
+                    rubble=board["rubble"],
+                    ice=board["ice"],
+                    ore=board["ore"],
+                    lichen=board["lichen"],
+                    lichen_strains=board["lichen_strains"],
+                    factory_occupancy_map=self.factory_occupancy_map,
+                    factories_per_team=board["factories_per_team"],
+                    valid_spawns_mask=board["valid_spawns_mask"],
+                    strain_ledger=board.get("strain_ledger")
+                )
+            )
+        game_state = self.game_state
+        game_state.env_steps = step
+        game_state.board.valid_spawns_mask = board["valid_spawns_mask"]
+        game_state.units = units
+        game_state.factories = factories
+        game_state.teams = teams
+        return game_state
+
+    def update_units(self, agent, units_data) -> dict:
+        units = dict()
+        for unit_id, unit_data in units_data.items():
+            unit = self.units.get(unit_id)
+            if unit is None:
+                unit = Unit(**unit_data)
+                unit.cargo = UnitCargo(**unit_data["cargo"])
+                self.units[unit_id] = unit
+            else:
+                unit.pos = unit_data["pos"]
+                unit.power = unit_data["power"]
+                unit.action_queue = unit_data["action_queue"]
+                update_cargo(unit.cargo, unit_data["cargo"])
+            units[unit_id] = unit
+        self.born["units"][agent] = units.keys() - self.game_units(agent)
+        self.died["units"][agent] = self.game_units(agent) - units.keys()
+        for unit_id in self.died["units"][agent]:
+            del self.units[unit_id]
+        return units
+
+    def update_factories(self, agent, factories_data) -> dict:
+        factories = dict()
+        for unit_id, f_data in factories_data.items():
+            factory = self.factories.get(unit_id)
+            if factory is None:
+                factory = Factory(**f_data)
+                factory.cargo = UnitCargo(**f_data["cargo"])
+                self.factories[unit_id] = factory
+                self.factory_occupancy_map[factory.pos_slice] = factory.strain_id
+            else:
+                factory.power = f_data["power"]
+                update_cargo(factory.cargo, f_data["cargo"])
+            factories[unit_id] = factory
+        self.born["factories"][agent] = factories.keys() - self.game_factories(agent)
+        self.died["factories"][agent] = self.game_factories(agent) - factories.keys()
+        for unit_id in self.died["factories"][agent]:
+            self.factory_occupancy_map[self.factories.pop(unit_id).pos_slice] = -1
+        return factories
+
+    def game_units(self, agent):
+        # ids of the player's units as of the last update
+        if self.game_state is None:
+            return set()
+        return self.game_state.units.get(agent, dict()).keys()
+
+    def game_factories(self, agent):
+        if self.game_state is None:
+            return set()
+        return self.game_state.factories.get(agent, dict()).keys()
+
+
+def update_cargo(cargo: UnitCargo, cargo_data: dict):
+    cargo.ice = cargo_data["ice"]
+    cargo.ore = cargo_data["ore"]
+    cargo.water = cargo_data["water"]
+    cargo.metal = cargo_data["metal"]
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class StrainLedger:
+    """
+    Tiles and total lichen of every lichen strain, kept up to date from the per tile lichen and lichen_strains deltas
+    process_obs applies each step, so asking about a strain doesn't mean scanning the whole board.
+    A tile belongs to the strain lichen_strains says it does, tiles are packed as x * width + y.
+    """
+    def __init__(self, board):
+        self.height, self.width = board["lichen_strains"].shape
+        self.tiles = dict()  # strain: {tiles}
+        self.lichen = dict()  # strain: total lichen on its tiles
+        # strain: its tiles with x == 1 plus its tiles with y == 1. factory_watering's lichen_count has always been
+        # np.count_nonzero(np.argwhere(lichen_map == strain) == 1), which is this and not the strain's tile count.
+        # The watering thresholds are tuned on it, so it is kept until they get re-tuned together
+        self.edges = dict()
+        strains = board["lichen_strains"].reshape(-1)
+        lichen = board["lichen"].reshape(-1)
+        for tile in np.flatnonzero(strains >= 0).tolist():
+            self.add(int(strains[tile]), tile, int(lichen[tile]))
+
+    def add(self, strain: int, tile: int, lichen: int):
+        self.tiles.setdefault(strain, set()).add(tile)
+        self.lichen[strain] = self.lichen.get(strain, 0) + lichen
+        self.edges[strain] = self.edges.get(strain, 0) + self.edge_tile(tile)
+
+    def remove(self, strain: int, tile: int, lichen: int):
+        self.tiles[strain].discard(tile)
+        self.lichen[strain] -= lichen
+        self.edges[strain] -= self.edge_tile(tile)
+
+    def edge_tile(self, tile: int) -> int:
+        return (tile // self.width == 1) + (tile % self.width == 1)
+
+    def apply(self, board, changed: dict):
+        # changed is {(x, y): (strain, lichen)} with the values from before this step's deltas
+        for (x, y), (old_strain, old_lichen) in changed.items():
+            tile = x * self.width + y
+            if old_strain >= 0:
+                self.remove(old_strain, tile, old_lichen)
+            new_strain = int(board["lichen_strains"][x, y])
+            if new_strain >= 0:
+                self.add(new_strain, tile, int(board["lichen"][x, y]))
+
+    def tile_count(self, strain: int) -> int:
+        return len(self.tiles.get(strain, ()))
+
+    def edge_count(self, strain: int) -> int:
+        return self.edges.get(strain, 0)
+
+    def total_lichen(self, strain: int) -> int:
+        return self.lichen.get(strain, 0)
+
+    def strain_tiles(self, strain: int) -> set:
+        return self.tiles.get(strain, set())
+
+    def strains_with_at_least(self, strains, amount: int, off_limits=()):
+        # same as find_most_common_integer on the lichen strain map with the off_limits tiles blanked out:
+        # of the given strains that have a tile, the ones with at least amount tiles in ascending order,
+        # None if none of them has a tile
+        counts = {strain: self.tile_count(strain) for strain in set(int(s) for s in strains)}
+        for x, y in {(int(pos[0]), int(pos[1])) for pos in off_limits}:
+            if not (0 <= x < self.height and 0 <= y < self.width):
+                continue
+            for strain in counts:
+                if x * self.width + y in self.tiles.get(strain, ()):
+                    counts[strain] -= 1
+        present = sorted(strain for strain, count in counts.items() if count > 0)
+        if len(present) == 0:
+            return None
+        return [strain for strain in present if counts[strain] >= amount]
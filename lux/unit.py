@@ -2,24 +2,44 @@ import math
 import sys
 from typing import List
 import numpy as np
-from dataclasses import dataclass
 from lux.cargo import UnitCargo
 from lux.config import EnvConfig
 
 # a[1] = direction (0 = center, 1 = up, 2 = right, 3 = down, 4 = left)
 move_deltas = np.array([[0, 0], [0, -1], [1, 0], [0, 1], [-1, 0]])
 
-@dataclass
+def frozen_position(pos) -> np.ndarray:
+    # positions are read only int arrays, so one can be handed around without anyone moving the unit by accident
+    pos = np.array(pos, dtype=np.int64)
+    pos.setflags(write=False)
+    return pos
+
+
 class Unit:
-    team_id: int
-    unit_id: str
-    unit_type: str # "LIGHT" or "HEAVY"
-    pos: np.ndarray
-    power: int
-    cargo: UnitCargo
-    env_cfg: EnvConfig
-    unit_cfg: dict
-    action_queue: List
+    __slots__ = ("team_id", "unit_id", "unit_type", "_pos", "power", "cargo", "action_queue")
+    env_cfg: EnvConfig = None  # the game's config, shared by every unit, see GameStateStore
+
+    def __init__(self, team_id: int, unit_id: str, unit_type: str, pos, power: int, cargo: UnitCargo,
+                 action_queue: List):
+        self.team_id = team_id
+        self.unit_id = unit_id
+        self.unit_type = unit_type  # "LIGHT" or "HEAVY"
+        self.pos = pos
+        self.power = power
+        self.cargo = cargo
+        self.action_queue = action_queue
+
+    @property
+    def pos(self) -> np.ndarray:
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos):
+        self._pos = frozen_position(pos)
+
+    @property
+    def unit_cfg(self):
+        return self.env_cfg.ROBOTS[self.unit_type]
 
     @property
     def agent_id(self):
@@ -43,34 +63,35 @@ class Unit:
         rubble_at_target = board.rubble[target_pos[0]][target_pos[1]]
         
         return math.floor(self.unit_cfg.MOVE_COST + self.unit_cfg.RUBBLE_MOVEMENT_COST * rubble_at_target)
+    # actions are 6 int lists, [type, direction, resource, amount, repeat, n], the same thing the env reads back
     def move(self, direction, repeat=0, n=1):
         if isinstance(direction, int):
             direction = direction
         else:
             pass
-        return np.array([0, direction, 0, 0, repeat, n])
+        return [0, direction, 0, 0, repeat, n]
 
     def transfer(self, transfer_direction, transfer_resource, transfer_amount, repeat=0, n=1):
         assert transfer_resource < 5 and transfer_resource >= 0
         assert transfer_direction < 5 and transfer_direction >= 0
-        return np.array([1, transfer_direction, transfer_resource, transfer_amount, repeat, n])
+        return [1, transfer_direction, transfer_resource, transfer_amount, repeat, n]
     
     def pickup(self, pickup_resource, pickup_amount, repeat=0, n=1):
         assert pickup_resource < 5 and pickup_resource >= 0
-        return np.array([2, 0, pickup_resource, pickup_amount, repeat, n])
+        return [2, 0, pickup_resource, pickup_amount, repeat, n]
     
     def dig_cost(self, game_state):
         return self.unit_cfg.DIG_COST
     def dig(self, repeat=0, n=1):
-        return np.array([3, 0, 0, 0, repeat, n])
+        return [3, 0, 0, 0, repeat, n]
 
     def self_destruct_cost(self, game_state):
         return self.unit_cfg.SELF_DESTRUCT_COST
     def self_destruct(self, repeat=0, n=1):
-        return np.array([4, 0, 0, 0, repeat, n])
+        return [4, 0, 0, 0, repeat, n]
 
     def recharge(self, x, repeat=0, n=1):
-        return np.array([5, 0, 0, x, repeat, n])
+        return [5, 0, 0, x, repeat, n]
 
     def __str__(self) -> str:
         out = f"[{self.team_id}] {self.unit_id} {self.unit_type} at {self.pos}"
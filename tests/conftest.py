@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the agent is run from the repo root (main.py imports lib and lux from there), the tests import it the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from lib.action_queues import ActionQueue
+
+
+def test_round_trips_as_list():
+    actions = [[0, 2, 0, 0, 0, 3], [1, 0, 4, 3000, 0, 1], [3, 0, 0, 0, 0, 1]]
+    queue = ActionQueue(actions)
+    assert queue == actions
+    assert queue.next_direction == 2
+
+
+def test_accepts_numpy_rows():
+    actions = [np.array([0, 1, 0, 0, 0, 1]), np.array([2, 0, 4, 32767, 0, 1])]
+    assert ActionQueue(actions) == [a.tolist() for a in actions]
+
+
+@pytest.mark.parametrize("value", [32768, 40000, -32769])
+def test_out_of_range_values_raise(value):
+    with pytest.raises(ValueError):
+        ActionQueue([[1, 0, 4, value, 0, 1]])
+
+
+@pytest.mark.parametrize("actions", [[], [[]]])
+def test_empty_rows_are_an_empty_queue(actions):
+    queue = ActionQueue(actions)
+    assert len(queue) == 0
+    assert queue == []
+    assert queue.next_direction == 0
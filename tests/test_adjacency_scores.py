@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from lib.setup_utils import PlacementScores, create_score_map, ring_scores, score_tile
+
+
+def loop_create_score_map(ice_tiles, ore_tiles):
+    # create_score_map as it was before the ring kernel
+    width, height = ice_tiles.shape
+    score_map = np.zeros((height, width), dtype=np.int32)
+
+    for row in range(2, height - 2):
+        for col in range(2, width - 2):
+            surrounding_ice = [
+                ice_tiles[row - 2, col - 1], ice_tiles[row - 2, col], ice_tiles[row - 2, col + 1],
+                ice_tiles[row - 1, col - 2], ice_tiles[row - 1, col + 2],
+                ice_tiles[row, col - 2], ice_tiles[row, col + 2],
+                ice_tiles[row + 1, col - 2], ice_tiles[row + 1, col + 2],
+                ice_tiles[row + 2, col - 1], ice_tiles[row + 2, col], ice_tiles[row + 2, col + 1]
+            ]
+            ice_adj = np.sum(surrounding_ice)
+
+            surrounding_ore = [
+                ore_tiles[row - 2, col - 1], ore_tiles[row - 2, col], ore_tiles[row - 2, col + 1],
+                ore_tiles[row - 1, col - 2], ore_tiles[row - 1, col + 2],
+                ore_tiles[row, col - 2], ore_tiles[row, col + 2],
+                ore_tiles[row + 1, col - 2], ore_tiles[row + 1, col + 2],
+                ore_tiles[row + 2, col - 1], ore_tiles[row + 2, col], ore_tiles[row + 2, col + 1]
+            ]
+            ore_adj = np.sum(surrounding_ore)
+
+            score_map[row, col] = score_tile(ice_adj, ore_adj)
+
+    return score_map
+
+
+def random_resources(seed, density):
+    rng = np.random.default_rng(seed)
+    ice = (rng.random((48, 48)) < density).astype(np.int64)
+    ore = ((rng.random((48, 48)) < density) & (ice == 0)).astype(np.int64)
+    return ice, ore
+
+
+@pytest.mark.parametrize("seed, density", [(0, 0.02), (1, 0.08), (2, 0.2), (3, 0.5)])
+def test_create_score_map_matches_loop(seed, density):
+    ice, ore = random_resources(seed, density)
+    score_map = create_score_map(ice, ore)
+    expected = loop_create_score_map(ice, ore)
+    assert score_map.dtype == expected.dtype
+    np.testing.assert_array_equal(score_map, expected)
+
+
+def test_ring_scores_match_loop():
+    ice, ore = random_resources(4, 0.1)
+    xs, ys = np.nonzero(np.random.default_rng(4).random((44, 44)) < 0.2)
+    xs, ys = xs + 2, ys + 2
+    np.testing.assert_array_equal(ring_scores(ice, ore, xs, ys), loop_create_score_map(ice, ore)[xs, ys])
+
+
+def test_adjacency_scores_catch_up_on_changes():
+    # later placement turns mask resources near my factories, only the tiles that see a change get rescored
+    placement_scores = PlacementScores()
+    ice, ore = random_resources(5, 0.1)
+    placement_scores.adjacency_scores(ice, ore)
+    ice, ore = ice.copy(), ore.copy()
+    ice[10:15, 0:4] = 0
+    ore[30:35, 40:45] = 0
+    np.testing.assert_array_equal(placement_scores.adjacency_scores(ice, ore), loop_create_score_map(ice, ore))
@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+
+from agent import Agent
+from lib.morphology import dilate, erode, positions_mask
+from lib.setup_utils import expand_mask, mask_resource_near_factories
+from lib.utils import distance_to
+from lux.config import EnvConfig
+
+
+def within(dx, dy, radius, metric):
+    if metric == "manhattan":
+        return abs(dx) + abs(dy) <= radius
+    return max(abs(dx), abs(dy)) <= radius
+
+
+def loop_dilate(mask, radius, metric="manhattan"):
+    dilated = np.zeros_like(mask, dtype=bool)
+    for x, y in np.argwhere(mask):
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                nx, ny = x + dx, y + dy
+                if within(dx, dy, radius, metric) and 0 <= nx < mask.shape[0] and 0 <= ny < mask.shape[1]:
+                    dilated[nx, ny] = True
+    return dilated
+
+
+def loop_erode(mask, radius, metric="manhattan", border_value=0):
+    eroded = np.zeros_like(mask, dtype=bool)
+    for x in range(mask.shape[0]):
+        for y in range(mask.shape[1]):
+            keep = True
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    if not within(dx, dy, radius, metric):
+                        continue
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < mask.shape[0] and 0 <= ny < mask.shape[1]:
+                        keep &= bool(mask[nx, ny])
+                    else:
+                        keep &= bool(border_value)
+            eroded[x, y] = keep
+    return eroded
+
+
+# the setup_utils and agent loops the morphology module replaced
+def loop_mask_resource_near_factories(resource_map, factories, n=2):
+    masked_ice_map = resource_map.copy()
+
+    for factory in factories:
+        x, y = factory[0], factory[1]
+        for dx in range(-n, n + 1):
+            for dy in range(-n, n + 1):
+                if abs(dx) + abs(dy) <= n:
+                    for fx in range(-1, 2):  # Loop through factory tiles
+                        for fy in range(-1, 2):
+                            i, j = x + dx + fx, y + dy + fy
+                            if 0 <= i < resource_map.shape[0] and 0 <= j < resource_map.shape[1]:
+                                masked_ice_map[i, j] = 0
+    return masked_ice_map
+
+
+def loop_expand_mask(valid_spawns, steps):
+    expanded_mask = np.zeros_like(valid_spawns)
+
+    for x in range(valid_spawns.shape[0]):
+        for y in range(valid_spawns.shape[1]):
+            if valid_spawns[x, y] == 0:
+                for dx in range(-steps, steps + 1):
+                    for dy in range(-steps, steps + 1):
+                        if abs(dx) + abs(dy) <= steps:
+                            nx, ny = x + dx, y + dy
+                            if 0 <= nx < valid_spawns.shape[0] and 0 <= ny < valid_spawns.shape[1]:
+                                expanded_mask[nx, ny] = 0
+
+    return expanded_mask
+
+
+def loop_find_clearing_position(low_rubble_scores, target_position, min_distance, max_distance):
+    best_coord = None
+    max_score = float('-inf')
+    for i in range(low_rubble_scores.shape[0]):
+        for j in range(low_rubble_scores.shape[1]):
+            current_coord = np.array([i, j])
+            distance = distance_to(target_position, current_coord)
+            if min_distance <= distance <= max_distance and low_rubble_scores[i, j] > max_score:
+                max_score = low_rubble_scores[i, j]
+                best_coord = current_coord
+    n = 5
+    x, y = best_coord
+    for i in range(-n, n + 1):
+        for j in range(-n, n + 1):
+            if abs(i) + abs(j) <= n and 0 <= x + i < low_rubble_scores.shape[0] and 0 <= y + j < \
+                    low_rubble_scores.shape[1]:
+                low_rubble_scores[x + i, y + j] = 0
+    return best_coord
+
+
+def random_mask(seed, density, shape=(48, 48)):
+    return np.random.default_rng(seed).random(shape) < density
+
+
+@pytest.mark.parametrize("metric", ["manhattan", "chebyshev"])
+@pytest.mark.parametrize("radius", [0, 1, 2, 5])
+def test_dilate_matches_loop(metric, radius):
+    mask = random_mask(radius, 0.02)
+    np.testing.assert_array_equal(dilate(mask, radius, metric), loop_dilate(mask, radius, metric))
+
+
+@pytest.mark.parametrize("metric", ["manhattan", "chebyshev"])
+@pytest.mark.parametrize("radius, border_value", [(0, 0), (1, 0), (2, 1), (3, 1)])
+def test_erode_matches_loop(metric, radius, border_value):
+    mask = random_mask(radius, 0.9, shape=(20, 20))
+    np.testing.assert_array_equal(erode(mask, radius, metric, border_value),
+                                  loop_erode(mask, radius, metric, border_value))
+
+
+def test_positions_mask_matches_loop():
+    positions = np.random.default_rng(0).integers(-3, 51, (60, 2))
+    expected = np.zeros((48, 48), dtype=bool)
+    for x, y in positions:
+        if 0 <= x < 48 and 0 <= y < 48:
+            expected[x, y] = True
+    np.testing.assert_array_equal(positions_mask(positions), expected)
+    np.testing.assert_array_equal(positions_mask([]), np.zeros((48, 48), dtype=bool))
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("n", [1, 2])
+def test_mask_resource_near_factories_matches_loop(seed, n):
+    rng = np.random.default_rng(seed)
+    resource = (rng.random((48, 48)) < 0.1).astype(np.int64)
+    factories = {(int(x), int(y)) for x, y in rng.integers(0, 48, (4, 2))}  # some on the edge of the map
+    np.testing.assert_array_equal(mask_resource_near_factories(resource, factories, n=n),
+                                  loop_mask_resource_near_factories(resource, factories, n=n))
+
+
+def test_expand_mask_matches_loop():
+    valid_spawns = random_mask(0, 0.7).astype(np.int64)
+    np.testing.assert_array_equal(expand_mask(valid_spawns, 4), loop_expand_mask(valid_spawns, 4))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("integer_scores", [False, True])
+def test_find_clearing_positions_matches_loop(seed, integer_scores):
+    # integer scores have plenty of ties, the first tile in row major order has to win them
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(0, 4, (48, 48)).astype(float) if integer_scores else rng.random((48, 48)) * 100
+    targets = [np.array(pos) for pos in rng.integers(0, 48, (5, 2))]
+
+    agent = Agent("player_0", EnvConfig())
+    agent_scores = scores.copy()
+    best_coords = agent.find_clearing_positions(targets, 4, 12, agent_scores)
+
+    loop_scores = scores.copy()
+    for target, best_coord in zip(targets, best_coords):
+        np.testing.assert_array_equal(best_coord, loop_find_clearing_position(loop_scores, target, 4, 12))
+    # each pick zeroes the scores around it for the next target, the way the loop did
+    np.testing.assert_array_equal(agent_scores, loop_scores)
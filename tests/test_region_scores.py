@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from lib.setup_utils import PlacementScores, count_region_cells, region_scores
+
+
+def loop_region_scores(array, max_dist=8, exponent=0.9):
+    # what setup did before region_scores, one recursive flood fill per tile
+    scores = np.zeros_like(array, dtype=float)
+    for i in range(array.shape[0]):
+        for j in range(array.shape[1]):
+            scores[i, j] = count_region_cells(array, (i, j), min_dist=0, max_dist=max_dist, exponent=exponent)
+    return scores
+
+
+def random_low_rubble(seed, density):
+    rng = np.random.default_rng(seed)
+    rubble = np.where(rng.random((48, 48)) < density, 0, rng.integers(25, 100, (48, 48)))
+    # the placement map, low rubble without the 4 tile vignette around the edge
+    vignette = np.ones(rubble.shape, dtype=bool)
+    vignette[4:-4, 4:-4] = False
+    return (rubble < 25) & ~vignette
+
+
+@pytest.mark.parametrize("seed, density", [(0, 0.3), (1, 0.6), (2, 0.9)])
+def test_region_scores_match_count_region_cells(seed, density):
+    low_rubble = random_low_rubble(seed, density)
+    np.testing.assert_allclose(region_scores(low_rubble, max_dist=8, exponent=0.9),
+                               loop_region_scores(low_rubble), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("max_dist, exponent", [(3, 1.0), (5, 0.5)])
+def test_region_scores_other_parameters(max_dist, exponent):
+    array = np.random.default_rng(3).random((20, 20)) < 0.6
+    np.testing.assert_allclose(region_scores(array, max_dist=max_dist, exponent=exponent),
+                               loop_region_scores(array, max_dist=max_dist, exponent=exponent), rtol=0, atol=1e-9)
+
+
+def test_region_scores_for_some_tiles():
+    low_rubble = random_low_rubble(4, 0.6)
+    xs, ys = np.nonzero(np.random.default_rng(4).random((48, 48)) < 0.1)
+    np.testing.assert_allclose(region_scores(low_rubble, tiles=(xs, ys)),
+                               region_scores(low_rubble)[xs, ys], rtol=0, atol=1e-12)
+
+
+def test_rubble_scores_catch_up_on_changes():
+    # later placement turns only rescore the tiles near a change, that has to end up where a full rescore would
+    placement_scores = PlacementScores()
+    low_rubble = random_low_rubble(5, 0.6)
+    placement_scores.rubble_scores(low_rubble)
+    low_rubble[20:23, 30:33] = True
+    low_rubble[5:12, 8] = False
+    np.testing.assert_allclose(placement_scores.rubble_scores(low_rubble), loop_region_scores(low_rubble),
+                               rtol=0, atol=1e-9)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from lux.strains import StrainLedger
+
+
+def random_board(rng):
+    strains = rng.integers(-1, 6, (48, 48))
+    lichen = np.where(strains >= 0, rng.integers(1, 100, (48, 48)), 0)
+    return {"lichen_strains": strains, "lichen": lichen}
+
+
+def step_board(rng, board, n_changes):
+    # change some tiles the way the observation deltas would, returning what the ledger gets from process_obs
+    changed = dict()
+    for x, y in rng.integers(0, 48, (n_changes, 2)).tolist():
+        if (x, y) not in changed:
+            changed[(x, y)] = (int(board["lichen_strains"][x, y]), int(board["lichen"][x, y]))
+        strain = int(rng.integers(-1, 6))
+        board["lichen_strains"][x, y] = strain
+        board["lichen"][x, y] = rng.integers(1, 100) if strain >= 0 else 0
+    return changed
+
+
+def assert_matches_board(ledger, board):
+    strains, lichen = board["lichen_strains"], board["lichen"]
+    for strain in range(-1, 7):
+        if strain >= 0:
+            assert ledger.tile_count(strain) == np.count_nonzero(strains == strain)
+            assert ledger.total_lichen(strain) == lichen[strains == strain].sum()
+        # factory_watering's old lichen_count
+        assert ledger.edge_count(strain) == (np.count_nonzero(np.argwhere(strains == strain) == 1) if strain >= 0 else 0)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_ledger_follows_deltas(seed):
+    rng = np.random.default_rng(seed)
+    board = random_board(rng)
+    ledger = StrainLedger(board)
+    assert_matches_board(ledger, board)
+    for _ in range(20):
+        ledger.apply(board, step_board(rng, board, 30))
+        assert_matches_board(ledger, board)
+
+
+def test_strains_with_at_least_matches_counts():
+    rng = np.random.default_rng(3)
+    board = random_board(rng)
+    ledger = StrainLedger(board)
+    off_limits = [np.array(pos) for pos in rng.integers(-2, 50, (40, 2))]
+    blanked = board["lichen_strains"].copy()
+    for x, y in off_limits:
+        if 0 <= x < 48 and 0 <= y < 48:
+            blanked[x, y] = -1
+    counts = {s: np.count_nonzero(blanked == s) for s in (1, 2, 4)}
+    expected = [s for s in sorted(counts) if counts[s] >= 300]
+    assert ledger.strains_with_at_least([4, 2, 1], 300, off_limits) == expected
+    assert ledger.strains_with_at_least([7], 1) is None